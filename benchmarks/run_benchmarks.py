@@ -0,0 +1,159 @@
+"""End-to-end benchmarks of the cluster builders on synthetic models.
+
+Every configuration runs ``main.py --profile`` in a fresh process, so load, clustering and writing are
+included and the reported peak memory belongs to that configuration alone. Results are appended as JSON
+lines; pass a previous result file as ``--baseline`` to get speedups against it.
+
+    python -m benchmarks.run_benchmarks --output /tmp/bench --vocab-sizes 10000 100000 --threads 1 4
+"""
+import argparse
+import itertools
+import json
+import logging
+import shlex
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from benchmarks.synthetic_models import write_synthetic_model, VALID_STRUCTURES
+
+MAIN_SCRIPT = Path(__file__).absolute().parent.parent / "main.py"
+VALID_ALGORITHMS = ["kmeans", "hkmeans", "dbscan", "simdim"]
+DEFAULT_ALGORITHM_ARGUMENTS = {"kmeans": "--k 100",
+                               "hkmeans": "--k 100",
+                               "dbscan": "--eps 1.5 --engine graph",
+                               "simdim": "--engine numpy --shared-memory"}
+
+
+def main() -> None:
+    logging.basicConfig(format="%(asctime)s : [%(threadName)s] %(levelname)s : %(message)s", level=logging.INFO)
+    args: Any = _initialize_parser().parse_args()
+    args.output.mkdir(parents=True, exist_ok=True)
+
+    baseline: Dict[Tuple, Dict[str, Any]] = _load_baseline(args.baseline) if args.baseline else {}
+    results_path: Path = Path(args.output, "benchmark.jsonl")
+
+    with tempfile.TemporaryDirectory(dir=str(args.output)) as scratch_directory:
+        for vocab_size, dimensions, structure in itertools.product(args.vocab_sizes, args.dimensions,
+                                                                  args.structures):
+            model_path: Path = Path(scratch_directory, f"{structure}-{vocab_size}x{dimensions}.model")
+            write_synthetic_model(model_path, vocab_size, dimensions, structure,
+                                  binary=args.binary, seed=args.seed)
+
+            for algorithm, threads in itertools.product(args.algorithms, args.threads):
+                result: Dict[str, Any] = _run_benchmark(model_path, Path(scratch_directory), algorithm, threads,
+                                                        getattr(args, f"{algorithm}_args"))
+                result.update(vocab_size=vocab_size, dimensions=dimensions, structure=structure)
+                _compare_to_baseline(result, baseline)
+
+                with open(results_path, "a+") as results_file:
+                    results_file.write(json.dumps(result) + "\n")
+                logging.info(f"Benchmark result: {json.dumps(result)}")
+
+            model_path.unlink()
+
+
+def _run_benchmark(model_path: Path, output_directory: Path, algorithm: str, threads: int,
+                   algorithm_arguments: str) -> Dict[str, Any]:
+    command: List[str] = [sys.executable, str(MAIN_SCRIPT), algorithm,
+                          "--input", str(model_path),
+                          "--output", str(output_directory),
+                          "--output-mode", "csv",
+                          "--threads", str(threads),
+                          "--profile"] + shlex.split(algorithm_arguments)
+    result: Dict[str, Any] = {"algorithm": algorithm, "arguments": algorithm_arguments, "threads": threads}
+
+    completed: subprocess.CompletedProcess = subprocess.run(command, cwd=str(MAIN_SCRIPT.parent))
+    if completed.returncode != 0:
+        return {**result, "error": f"exit code {completed.returncode}"}
+
+    metrics_path: Path = next(output_directory.glob("*.metrics.json"))
+    with open(metrics_path) as metrics_file:
+        metrics: Dict[str, Any] = json.load(metrics_file)
+    for produced_file in output_directory.glob(f"{metrics['name']}.*"):
+        produced_file.unlink()
+
+    total: Dict[str, Any] = metrics["total"]
+    return {**result,
+            "wall_seconds": total["wall_seconds"],
+            "cpu_seconds": total["cpu_seconds"] + total["children_cpu_seconds"],
+            "peak_rss_bytes": max(total["peak_rss_bytes"], total["children_peak_rss_bytes"]),
+            "stages": {stage["stage"]: stage["wall_seconds"] for stage in metrics["stages"]}}
+
+
+def _compare_to_baseline(result: Dict[str, Any], baseline: Dict[Tuple, Dict[str, Any]]) -> None:
+    if "error" in result:
+        return
+
+    result["entities_per_second"] = result["vocab_size"] / result["wall_seconds"]
+
+    reference: Optional[Dict[str, Any]] = baseline.get(_result_key(result))
+    if reference and "error" not in reference:
+        result["speedup"] = reference["wall_seconds"] / result["wall_seconds"]
+        result["memory_ratio"] = result["peak_rss_bytes"] / reference["peak_rss_bytes"]
+
+
+def _load_baseline(baseline_path: Path) -> Dict[Tuple, Dict[str, Any]]:
+    with open(baseline_path) as baseline_file:
+        return {_result_key(result): result for result in map(json.loads, baseline_file)}
+
+
+def _result_key(result: Dict[str, Any]) -> Tuple:
+    return (result["algorithm"], result["arguments"], result["threads"],
+            result["vocab_size"], result["dimensions"], result["structure"])
+
+
+def _initialize_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark the cluster builders on synthetic embeddings")
+
+    parser.add_argument("--output",
+                        help="Directory receiving benchmark.jsonl",
+                        type=Path,
+                        required=True)
+    parser.add_argument("--vocab-sizes",
+                        help="Numbers of entities of the generated models",
+                        nargs="+",
+                        type=int,
+                        default=[10000, 100000])
+    parser.add_argument("--dimensions",
+                        help="Dimensionalities of the generated models",
+                        nargs="+",
+                        type=int,
+                        default=[50, 300])
+    parser.add_argument("--structures",
+                        help=f"Cluster structures of the generated models. Choose from: {', '.join(VALID_STRUCTURES)}",
+                        nargs="+",
+                        choices=VALID_STRUCTURES,
+                        default=["blobs"])
+    parser.add_argument("--algorithms",
+                        help=f"Builders to benchmark. Choose from: {', '.join(VALID_ALGORITHMS)}",
+                        nargs="+",
+                        choices=VALID_ALGORITHMS,
+                        default=VALID_ALGORITHMS)
+    parser.add_argument("--threads",
+                        help="Thread counts to measure scaling with",
+                        nargs="+",
+                        type=int,
+                        default=[1, 4])
+    for algorithm in VALID_ALGORITHMS:
+        parser.add_argument(f"--{algorithm}-args",
+                            help=f"Additional arguments passed to the {algorithm} subcommand",
+                            default=DEFAULT_ALGORITHM_ARGUMENTS[algorithm])
+    parser.add_argument("--binary",
+                        help="Generate binary instead of text word2vec models",
+                        action="store_true")
+    parser.add_argument("--seed",
+                        help="Seed of the model generator",
+                        type=int,
+                        default=0)
+    parser.add_argument("--baseline",
+                        help="Previous benchmark.jsonl to compare against",
+                        type=Path)
+
+    return parser
+
+
+if __name__ == "__main__":
+    main()
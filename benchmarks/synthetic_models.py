@@ -0,0 +1,42 @@
+from pathlib import Path
+
+import numpy as np
+
+VALID_STRUCTURES = ["blobs", "uniform"]
+GENERATION_CHUNK_SIZE = 10000
+
+
+def write_synthetic_model(model_path: Path, vocab_size: int, dimensions: int, structure: str = "blobs",
+                          number_of_blobs: int = 100, binary: bool = False, seed: int = 0) -> Path:
+    """Write a reproducible word2vec model of ``vocab_size`` random entities.
+
+    ``blobs`` draws every entity around one of ``number_of_blobs`` centers, ``uniform`` has no cluster
+    structure at all. Coordinates are scaled by 1/sqrt(dimensions), so blob radii and center distances
+    stay comparable across dimensionalities.
+    """
+    if structure not in VALID_STRUCTURES:
+        raise Exception(f"Invalid structure '{structure}'. Choose from {', '.join(VALID_STRUCTURES)}")
+
+    random: np.random.RandomState = np.random.RandomState(seed)
+    scale: float = 1 / np.sqrt(dimensions)
+    centers: np.ndarray = random.normal(0, 5 * scale, size=(number_of_blobs, dimensions))
+
+    with open(model_path, "wb") as model_file:
+        model_file.write(f"{vocab_size} {dimensions}\n".encode("utf-8"))
+
+        for start in range(0, vocab_size, GENERATION_CHUNK_SIZE):
+            size: int = min(GENERATION_CHUNK_SIZE, vocab_size - start)
+
+            if structure == "blobs":
+                vectors: np.ndarray = centers[random.randint(number_of_blobs, size=size)]
+                vectors = vectors + random.normal(0, scale, size=(size, dimensions))
+            else:
+                vectors = random.uniform(-5 * scale, 5 * scale, size=(size, dimensions))
+
+            for index, vector in enumerate(vectors.astype(np.float32), start=start):
+                if binary:
+                    model_file.write(f"entity_{index} ".encode("utf-8") + vector.tobytes() + b"\n")
+                else:
+                    model_file.write(f"entity_{index} {' '.join(map(repr, vector.tolist()))}\n".encode("utf-8"))
+
+    return model_path
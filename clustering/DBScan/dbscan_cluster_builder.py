@@ -1,30 +1,99 @@
+from math import sqrt
 from pathlib import Path
-from typing import Iterable
+from typing import List, Dict, Tuple
 
+import numpy as np
+from scipy import sparse
 from sklearn.cluster import DBSCAN
+from sklearn.neighbors import NearestNeighbors
+from sklearn.preprocessing import normalize
 
 from clustering.abstract_cluster_builder import AbstractClusterBuilder
 
-DBSCAN_METRIC = "euclidean"
-# DBSCAN_METRIC = "cosine"
+VALID_DBSCAN_METRICS = ["euclidean", "cosine"]
+VALID_DBSCAN_ENGINES = ["sklearn", "graph"]
+NEIGHBORHOOD_CHUNK_SIZE = 10000
+DBSCAN_MIN_SAMPLES = 3
 
 
 class DBScanClusterBuilder(AbstractClusterBuilder):
 
-    def __init__(self, input_model_path: Path, parallel_executions: int, eps: float):
+    def __init__(self, input_model_path: Path, parallel_executions: int, eps: float, metric: str = "euclidean",
+                 engine: str = "sklearn"):
         AbstractClusterBuilder.__init__(self, input_model_path, parallel_executions)
+
+        if metric not in VALID_DBSCAN_METRICS:
+            raise Exception(f"Invalid DBSCAN metric '{metric}'. Choose from {', '.join(VALID_DBSCAN_METRICS)}")
+        if engine not in VALID_DBSCAN_ENGINES:
+            raise Exception(f"Invalid DBSCAN engine '{engine}'. Choose from {', '.join(VALID_DBSCAN_ENGINES)}")
+
         self._eps: float = eps
+        self._metric: str = metric
+        self._engine: str = engine
 
     def _train_specific_clusters(self) -> None:
-        self._dbscan: DBSCAN = DBSCAN(algorithm='auto', eps=self._eps, metric=DBSCAN_METRIC,
-                                      min_samples=3, n_jobs=self._parallel_executions)
-        self._labels: Iterable[str] = self._dbscan.fit_predict(self._embeddings)
+        if self._engine == "graph":
+            self._train_graph_clusters()
+            return
 
-    def _map_embeddings_to_clusters(self) -> None:
-        self._clusters = {label: [] for label in set(self._labels)}
+        self._dbscan: DBSCAN = DBSCAN(algorithm='auto', eps=self._eps, metric=self._metric,
+                                      min_samples=DBSCAN_MIN_SAMPLES, n_jobs=self._parallel_executions)
+        self._labels = self._dbscan.fit_predict(self._embeddings)
+
+    def _train_graph_clusters(self) -> None:
+        embeddings, radius = self._neighbor_space(self._embeddings)
+
+        neighbors: NearestNeighbors = NearestNeighbors(radius=radius, n_jobs=self._parallel_executions)
+        neighbors.fit(embeddings)
+
+        graphs: List[sparse.csr_matrix] = [
+            neighbors.radius_neighbors_graph(embeddings[start:start + NEIGHBORHOOD_CHUNK_SIZE], mode="distance")
+            for start in range(0, len(embeddings), NEIGHBORHOOD_CHUNK_SIZE)]
+        graph: sparse.csr_matrix = sparse.vstack(graphs, format="csr")
+
+        if self._metric == "cosine":
+            graph.data = graph.data ** 2 / 2
+
+        self._dbscan = DBSCAN(eps=self._eps, metric="precomputed", min_samples=DBSCAN_MIN_SAMPLES,
+                              n_jobs=self._parallel_executions)
+        self._labels = self._dbscan.fit_predict(graph)
 
-        for i, word in enumerate(self._model.vocab):
-            self._clusters[self._dbscan.labels_[i]].append(word)
+    def _assign_to_restored_clusters(self) -> None:
+        core_samples, radius = self._neighbor_space(self._restored_state["core_samples"])
+        core_labels: np.ndarray = self._restored_state["core_labels"]
+
+        self._labels = np.full(len(self._embeddings), -1, dtype=np.int32)
+        if len(core_samples) == 0:
+            return
+
+        neighbors: NearestNeighbors = NearestNeighbors(n_neighbors=1, n_jobs=self._parallel_executions)
+        neighbors.fit(core_samples)
+
+        # like DBSCAN border points, entities join the cluster of the nearest core sample within eps
+        for start in range(0, len(self._embeddings), NEIGHBORHOOD_CHUNK_SIZE):
+            embeddings, _ = self._neighbor_space(self._embeddings[start:start + NEIGHBORHOOD_CHUNK_SIZE])
+            distances, indices = neighbors.kneighbors(embeddings)
+            within_eps: np.ndarray = distances[:, 0] <= radius
+            self._labels[start:start + len(embeddings)][within_eps] = core_labels[indices[within_eps, 0]]
+
+    def _fitted_state(self) -> Dict[str, np.ndarray]:
+        core_sample_indices: np.ndarray = self._dbscan.core_sample_indices_
+        return {"algorithm": np.array("dbscan"),
+                "eps": np.array(self._eps),
+                "metric": np.array(self._metric),
+                "core_samples": np.asarray(self._embeddings[core_sample_indices]),
+                "core_labels": self._labels[core_sample_indices]}
+
+    def _neighbor_space(self, embeddings: np.ndarray) -> Tuple[np.ndarray, float]:
+        if self._metric == "cosine":
+            # the cosine distance of unit vectors is half their squared euclidean distance,
+            # which lets the neighbour index keep using euclidean trees
+            return normalize(embeddings), sqrt(2 * self._eps)
+
+        return embeddings, self._eps
+
+    def _map_embeddings_to_clusters(self) -> None:
+        self.clusters().cluster_index()
 
     def name(self) -> str:
         return f"DBSCAN"
@@ -0,0 +1,120 @@
+import logging
+from math import sqrt
+from pathlib import Path
+from typing import List, NamedTuple, Tuple
+
+import numpy as np
+from sklearn.cluster import DBSCAN
+from sklearn.neighbors import NearestNeighbors
+from sklearn.preprocessing import normalize
+
+from clustering.DBScan.dbscan_cluster_builder import DBSCAN_MIN_SAMPLES, NEIGHBORHOOD_CHUNK_SIZE, \
+    VALID_DBSCAN_METRICS
+from util.model_io import load_model
+from util.utils import measure
+
+EPS_QUANTILES = [0.5, 0.9, 0.95]
+CURVE_POINTS = 100
+
+
+class EpsSuggestion(NamedTuple):
+    source: str
+    eps: float
+    clusters: int
+    noise_fraction: float
+
+
+class EpsEstimator:
+    """Suggests DBSCAN radii from the k-distance curve of a sample and previews DBSCAN on that sample.
+
+    A sample is sparser than the whole model, so the suggested radii tend to be somewhat too large for full runs.
+    """
+
+    def __init__(self, input_model_path: Path, parallel_executions: int, sample_size: int = 10000,
+                 metric: str = "euclidean", min_samples: int = DBSCAN_MIN_SAMPLES):
+        if metric not in VALID_DBSCAN_METRICS:
+            raise Exception(f"Invalid DBSCAN metric '{metric}'. Choose from {', '.join(VALID_DBSCAN_METRICS)}")
+
+        self._input_model_path: Path = input_model_path
+        self._parallel_executions: int = parallel_executions
+        self._sample_size: int = sample_size
+        self._metric: str = metric
+        self._min_samples: int = min_samples
+        self._k_distances: np.ndarray = np.empty(0)
+        self._suggestions: List[EpsSuggestion] = []
+
+    def run(self) -> List[EpsSuggestion]:
+        embeddings: np.ndarray = measure(lambda: load_model(self._input_model_path).vectors, "loading model")
+        sample_indices: np.ndarray = np.random.RandomState(0).choice(len(embeddings),
+                                                                     min(self._sample_size, len(embeddings)),
+                                                                     replace=False)
+        sample: np.ndarray = np.asarray(embeddings[np.sort(sample_indices)])
+        del embeddings
+
+        if self._metric == "cosine":
+            # unit vectors let the neighbour search stay euclidean, like the DBSCAN builder does
+            sample = normalize(sample)
+
+        self._k_distances = measure(lambda: self._compute_k_distances(sample), "computing k-distances")
+        candidates: List[Tuple[str, float]] = [("knee", self._knee())]
+        candidates += [(f"quantile-{quantile}", float(np.quantile(self._k_distances, quantile)))
+                       for quantile in EPS_QUANTILES]
+
+        self._suggestions = measure(lambda: [self._preview(sample, source, eps) for source, eps in candidates],
+                                    "previewing DBSCAN")
+        return self._suggestions
+
+    def _compute_k_distances(self, sample: np.ndarray) -> np.ndarray:
+        # DBSCAN counts a point as its own neighbour, so the core distance is the one to the
+        # (min_samples - 1)th other point, which is the last of min_samples neighbours including the point itself
+        neighbors: NearestNeighbors = NearestNeighbors(n_neighbors=self._min_samples,
+                                                       n_jobs=self._parallel_executions)
+        neighbors.fit(sample)
+
+        k_distances: np.ndarray = np.empty(len(sample), dtype=np.float64)
+        for start in range(0, len(sample), NEIGHBORHOOD_CHUNK_SIZE):
+            distances, _ = neighbors.kneighbors(sample[start:start + NEIGHBORHOOD_CHUNK_SIZE])
+            k_distances[start:start + len(distances)] = distances[:, -1]
+
+        if self._metric == "cosine":
+            k_distances = k_distances ** 2 / 2
+
+        return np.sort(k_distances)
+
+    def _knee(self) -> float:
+        """Point of the ascending k-distance curve farthest below the line connecting its ends."""
+        positions: np.ndarray = np.linspace(0, 1, len(self._k_distances))
+        span: float = self._k_distances[-1] - self._k_distances[0]
+        scaled: np.ndarray = (self._k_distances - self._k_distances[0]) / span if span else positions
+
+        return float(self._k_distances[int(np.argmax(positions - scaled))])
+
+    def _preview(self, sample: np.ndarray, source: str, eps: float) -> EpsSuggestion:
+        radius: float = sqrt(2 * eps) if self._metric == "cosine" else eps
+        labels: np.ndarray = DBSCAN(eps=radius, min_samples=self._min_samples,
+                                    n_jobs=self._parallel_executions).fit_predict(sample)
+
+        suggestion: EpsSuggestion = EpsSuggestion(source, eps, len(set(labels.tolist()) - {-1}),
+                                                  float(np.mean(labels == -1)))
+        logging.info(f"[EPS-{eps}] {source}: {suggestion.clusters} clusters, "
+                     f"noise fraction: {suggestion.noise_fraction}")
+        return suggestion
+
+    def write(self, output_directory: Path) -> Path:
+        output_path: Path = Path(output_directory.absolute(), f"{self.name()}.csv")
+
+        with open(output_path, "w+") as output:
+            print("source,eps,clusters,noise_fraction", file=output)
+            for suggestion in self._suggestions:
+                print(f"{suggestion.source},{suggestion.eps},{suggestion.clusters},{suggestion.noise_fraction}",
+                      file=output)
+
+        with open(Path(output_directory.absolute(), f"{self.name()}.k-distances.csv"), "w+") as output:
+            print("quantile,k_distance", file=output)
+            for quantile in np.linspace(0, 1, CURVE_POINTS + 1).tolist():
+                print(f"{quantile},{np.quantile(self._k_distances, quantile)}", file=output)
+
+        return output_path
+
+    def name(self) -> str:
+        return f"dbscan-eps-estimate"
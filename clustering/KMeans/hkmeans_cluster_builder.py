@@ -0,0 +1,146 @@
+import logging
+from math import sqrt
+from multiprocessing.pool import Pool
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+from sklearn import cluster
+from sklearn.metrics import pairwise_distances_argmin
+
+from clustering.KMeans.hkmeans_group_worker import HKMeansGroupWorker
+from clustering.KMeans.kmeans_cluster_builder import ASSIGNMENT_CHUNK_SIZE, centroid_distances
+from clustering.abstract_cluster_builder import AbstractClusterBuilder
+from clustering.cluster_assignment import ClusterAssignment
+from util import profiling
+from util.embedding_storage import estimator_input
+from util.shared_matrix import SharedMatrix, share_matrix
+from util.utils import measure
+
+
+class HKMeansClusterBuilder(AbstractClusterBuilder):
+    """Two-level k-means: about sqrt(k) coarse groups, each split into fine clusters by a worker process.
+
+    Every iteration of the fine fits compares a vector with the centroids of its group only, which makes large k
+    cheaper than a single fit with all k centroids. The k fine clusters are the flat result, ``hierarchy()`` maps
+    each of them to its coarse group.
+    """
+
+    def __init__(self, input_model_path: Path, parallel_executions: int, k: int, with_distances: bool = False):
+        AbstractClusterBuilder.__init__(self, input_model_path, parallel_executions)
+        self._k: int = k
+        self._coarse_k: int = max(1, round(sqrt(k)))
+        self._with_distances: bool = with_distances
+        self._coarse_centroids: np.ndarray = np.empty(0)
+        self._centroids: np.ndarray = np.empty(0)
+        self._hierarchy: np.ndarray = np.empty(0, dtype=np.int32)
+
+    def _train_specific_clusters(self) -> None:
+        if self._k > len(self._embeddings):
+            raise Exception(f"Cannot build {self._k} clusters of {len(self._embeddings)} entities")
+
+        coarse_kmeans: cluster.KMeans = measure(lambda: cluster.KMeans(n_clusters=self._coarse_k,
+                                                                       algorithm="auto",
+                                                                       init="k-means++",
+                                                                       n_jobs=self._parallel_executions)
+                                                .fit(estimator_input(self._embeddings)), "coarse clustering")
+        self._coarse_centroids = coarse_kmeans.cluster_centers_
+        coarse_labels: np.ndarray = coarse_kmeans.labels_
+
+        if self._shared_matrix:
+            self._cluster_groups(self._shared_matrix, coarse_labels)
+            return
+
+        with share_matrix(self._embeddings) as matrix:
+            # the workers map the shared copy anyway, release the private one before the fine fits start
+            self._embeddings = matrix.open()
+            self._cluster_groups(matrix, coarse_labels)
+
+    def _cluster_groups(self, matrix: SharedMatrix, coarse_labels: np.ndarray) -> None:
+        group_members: List[np.ndarray] = [np.flatnonzero(coarse_labels == group) for group in range(self._coarse_k)]
+        group_k: np.ndarray = self._allocate_fine_clusters(np.array([len(members) for members in group_members]))
+        # fine cluster ids are consecutive within a group
+        group_offsets: np.ndarray = np.concatenate([[0], np.cumsum(group_k)])
+
+        # the largest groups take longest, starting them first keeps all workers busy until the end
+        tasks: List[Tuple[int, np.ndarray, int]] = sorted(((group, group_members[group], int(group_k[group]))
+                                                           for group in range(self._coarse_k) if group_k[group]),
+                                                          key=lambda task: -len(task[1]))
+        self._labels = np.empty(len(coarse_labels), dtype=np.int32)
+        self._centroids = np.empty((self._k, matrix.shape[1]), dtype=np.float64)
+
+        with Pool(processes=self._parallel_executions) as pool:
+            for group, labels, centroids in pool.imap_unordered(HKMeansGroupWorker(matrix), tasks):
+                self._labels[group_members[group]] = labels + group_offsets[group]
+                self._centroids[group_offsets[group]:group_offsets[group + 1]] = centroids
+                profiling.record("groups", group=group, entities=len(labels), clusters=len(centroids))
+
+        self._hierarchy = np.repeat(np.arange(self._coarse_k, dtype=np.int32), group_k)
+
+    def _allocate_fine_clusters(self, group_sizes: np.ndarray) -> np.ndarray:
+        """Split k into fine clusters per group, proportional to the group sizes by the largest remainder.
+
+        Every non-empty group gets at least one cluster and no group more clusters than members.
+        """
+        shares: np.ndarray = group_sizes * self._k / group_sizes.sum()
+        group_k: np.ndarray = np.minimum(np.maximum(np.floor(shares), 1), group_sizes).astype(np.int64)
+
+        while group_k.sum() != self._k:
+            remainders: np.ndarray = shares - group_k
+            if group_k.sum() < self._k:
+                remainders[group_k >= group_sizes] = -np.inf
+                group_k[np.argmax(remainders)] += 1
+            else:
+                remainders[group_k <= 1] = np.inf
+                group_k[np.argmin(remainders)] -= 1
+
+        logging.info(f"Splitting {self._coarse_k} coarse groups into {group_k.min()} to {group_k.max()} clusters")
+        return group_k
+
+    def _assign_to_restored_clusters(self) -> None:
+        self._coarse_centroids = self._restored_state["coarse_centroids"]
+        self._centroids = self._restored_state["centroids"]
+        self._hierarchy = self._restored_state["hierarchy"]
+        group_clusters: List[np.ndarray] = [np.flatnonzero(self._hierarchy == group)
+                                            for group in range(len(self._coarse_centroids))]
+
+        # like in training, an entity is compared with the fine clusters of its nearest coarse group only
+        self._labels = np.empty(len(self._embeddings), dtype=np.int32)
+        for start in range(0, len(self._embeddings), ASSIGNMENT_CHUNK_SIZE):
+            vectors: np.ndarray = self._embeddings[start:start + ASSIGNMENT_CHUNK_SIZE]
+            coarse_labels: np.ndarray = pairwise_distances_argmin(vectors, self._coarse_centroids)
+
+            for group in np.unique(coarse_labels).tolist():
+                rows: np.ndarray = np.flatnonzero(coarse_labels == group)
+                self._labels[start + rows] = group_clusters[group][
+                    pairwise_distances_argmin(vectors[rows], self._centroids[group_clusters[group]])]
+
+    def _fitted_state(self) -> Dict[str, np.ndarray]:
+        return {"algorithm": np.array("hkmeans"), "coarse_centroids": self._coarse_centroids,
+                "centroids": self._centroids, "hierarchy": self._hierarchy}
+
+    def _map_embeddings_to_clusters(self) -> None:
+        self._assignment = ClusterAssignment(self._labels, self._entities,
+                                             scores=self.distances() if self._with_distances else None,
+                                             parallel_executions=self._parallel_executions)
+        self._assignment.cluster_index()
+
+    def distances(self) -> np.ndarray:
+        return centroid_distances(self._embeddings, self._centroids, self._labels)
+
+    def hierarchy(self) -> np.ndarray:
+        """Coarse group of every fine cluster, indexed by fine cluster id."""
+        return self._hierarchy
+
+    def write_hierarchy(self, output_directory: Path) -> Path:
+        output_path: Path = Path(output_directory.absolute(), f"{self.name()}.hierarchy.csv")
+
+        with open(output_path, "w+") as output:
+            print("cluster_id,coarse_cluster_id", file=output)
+            for cluster_id, coarse_cluster_id in enumerate(self._hierarchy.tolist()):
+                print(f"{cluster_id},{coarse_cluster_id}", file=output)
+
+        return output_path
+
+    def name(self) -> str:
+        return f"hk-means-{self._k}"
@@ -0,0 +1,40 @@
+import logging
+from typing import Tuple
+
+import numpy as np
+from sklearn import cluster
+
+from util.shared_matrix import SharedMatrix
+
+
+class HKMeansGroupWorker:
+    """Splits one coarse group of the hierarchical k-means into its fine clusters.
+
+    The vectors are read from a ``SharedMatrix``, so only the entity indices of the group travel to the worker
+    and only its local labels and centroids travel back.
+    """
+
+    def __init__(self, matrix: SharedMatrix):
+        self._matrix: SharedMatrix = matrix
+
+    def __call__(self, task: Tuple[int, np.ndarray, int]):
+        return self.cluster_group(*task)
+
+    def cluster_group(self, group: int, entity_indices: np.ndarray, k: int) -> Tuple[int, np.ndarray, np.ndarray]:
+        logging.info(f"[GROUP-{group}] begin: {len(entity_indices)} entities into {k} clusters")
+
+        vectors: np.ndarray = np.asarray(self._matrix.open()[entity_indices])
+        if k == 1:
+            labels: np.ndarray = np.zeros(len(vectors), dtype=np.int32)
+            centroids: np.ndarray = vectors.mean(axis=0, keepdims=True)
+        else:
+            # the pool parallelizes over the groups, every fit runs single-threaded
+            kmeans: cluster.KMeans = cluster.KMeans(n_clusters=k,
+                                                    algorithm="auto",
+                                                    init="k-means++",
+                                                    n_jobs=1).fit(vectors)
+            labels = kmeans.labels_.astype(np.int32)
+            centroids = kmeans.cluster_centers_
+
+        logging.info(f"[GROUP-{group}] done")
+        return group, labels, centroids
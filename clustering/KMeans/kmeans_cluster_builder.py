@@ -1,28 +1,173 @@
+import logging
 from pathlib import Path
+from typing import Optional, Dict, Mapping, Union
 
+import numpy as np
+from scipy import sparse
 from sklearn import cluster
+from sklearn.metrics import pairwise_distances_argmin
 
 from clustering.abstract_cluster_builder import AbstractClusterBuilder
+from clustering.cluster_assignment import ClusterAssignment
+from util import profiling
+from util.embedding_storage import estimator_input
+from util.model_io import pack_entities, unpack_entities
+from util.utils import measure
+
+ASSIGNMENT_CHUNK_SIZE = 10000
+# warm-started centroids are close to their optimum already, a full run uses up to 300 iterations
+WARM_START_MAX_ITERATIONS = 50
+
+
+def centroid_distances(embeddings: np.ndarray, centroids: np.ndarray, labels: np.ndarray) -> np.ndarray:
+    """Euclidean distance of every vector to the centroid of its cluster."""
+    distances: np.ndarray = np.empty(len(embeddings), dtype=np.float32)
+
+    for start in range(0, len(embeddings), ASSIGNMENT_CHUNK_SIZE):
+        end: int = start + ASSIGNMENT_CHUNK_SIZE
+        distances[start:end] = np.linalg.norm(embeddings[start:end] - centroids[labels[start:end]], axis=1)
+
+    return distances
 
 
 class KMeansClusterBuilder(AbstractClusterBuilder):
 
-    def __init__(self, input_model_path: Path, parallel_executions: int, k: int):
+    def __init__(self, input_model_path: Path, parallel_executions: int, k: int, batch_size: Optional[int] = None,
+                 with_distances: bool = False, warm_start: Optional[Mapping[str, np.ndarray]] = None):
         AbstractClusterBuilder.__init__(self, input_model_path, parallel_executions)
+
+        if warm_start is not None:
+            if str(warm_start["algorithm"]) != "kmeans":
+                raise Exception(f"Cannot warm-start k-means from a state of '{warm_start['algorithm']}'")
+            if len(warm_start["centroids"]) != k:
+                raise Exception(f"Cannot warm-start k-means with k={k} from {len(warm_start['centroids'])} centroids")
+
         self._k: int = k
+        self._with_distances: bool = with_distances
+        self._warm_start: Optional[Mapping[str, np.ndarray]] = warm_start
+        self._previous_labels: Optional[np.ndarray] = None
+        # the first partial fit has to see at least k vectors to initialize the centroids
+        self._batch_size: Optional[int] = max(batch_size, k) if batch_size else None
 
     def _train_specific_clusters(self) -> None:
-        self._kmeans: cluster.KMeans = cluster.KMeans(n_clusters=self._k,
-                                                      algorithm="auto",
-                                                      init="k-means++",
-                                                      n_jobs=self._parallel_executions)
-        self._kmeans = self._kmeans.fit(self._embeddings)
+        initial_centroids: Union[str, np.ndarray] = "k-means++"
+        if self._warm_start is not None:
+            initial_centroids = measure(self._align_previous_clusters, "aligning previous clusters")
+
+        if self._batch_size:
+            self._train_mini_batch_clusters(initial_centroids)
+        else:
+            self._kmeans: cluster.KMeans = cluster.KMeans(n_clusters=self._k,
+                                                          algorithm="auto",
+                                                          init=initial_centroids,
+                                                          n_jobs=self._parallel_executions,
+                                                          **self._warm_start_parameters())
+            self._kmeans = self._kmeans.fit(estimator_input(self._embeddings))
+            self._labels = self._kmeans.labels_
+            self._centroids: np.ndarray = self._kmeans.cluster_centers_
+
+        if self._previous_labels is not None:
+            self._report_churn()
+
+    def _warm_start_parameters(self) -> Dict[str, int]:
+        # a single run from the previous centroids keeps their ids, restarts would permute them
+        return {"n_init": 1, "max_iter": WARM_START_MAX_ITERATIONS} if self._warm_start is not None else {}
+
+    def _train_mini_batch_clusters(self, initial_centroids: Union[str, np.ndarray]) -> None:
+        self._kmeans = cluster.MiniBatchKMeans(n_clusters=self._k,
+                                               init=initial_centroids,
+                                               batch_size=self._batch_size,
+                                               **self._warm_start_parameters())
+
+        # seed the centroids from a sample spread over all vectors and visit the chunks in random order,
+        # the vocabulary is usually sorted by frequency
+        sample: np.ndarray = np.random.choice(len(self._embeddings),
+                                              min(len(self._embeddings), self._batch_size),
+                                              replace=False)
+        self._kmeans.partial_fit(self._embeddings[np.sort(sample)])
+
+        chunk_starts: np.ndarray = np.random.permutation(np.arange(0, len(self._embeddings), self._batch_size))
+        for i, start in enumerate(chunk_starts):
+            self._kmeans.partial_fit(self._embeddings[start:start + self._batch_size])
+
+            if (i + 1) % 100 == 0:
+                logging.info(f"Fitted {i + 1} of {len(chunk_starts)} batches")
+
+        self._labels = np.empty(len(self._embeddings), dtype=np.int32)
+        for start in range(0, len(self._embeddings), self._batch_size):
+            self._labels[start:start + self._batch_size] = self._kmeans.predict(
+                self._embeddings[start:start + self._batch_size])
+        self._centroids = self._kmeans.cluster_centers_
+
+    def _align_previous_clusters(self) -> np.ndarray:
+        """Initial centroids from the previous run, moved to the mean of their members' current vectors.
+
+        Members are matched by entity, so the centroids follow a retrained model even if its vector space drifted.
+        Clusters without any remaining member keep their previous centroid.
+        """
+        centroids: np.ndarray = np.array(self._warm_start["centroids"], dtype=np.float64)
+        if "entities" not in self._warm_start:
+            logging.info("The previous state lists no entities, warm-starting from its centroids as they are")
+            return centroids
+
+        previous_positions: Dict[str, int] = {entity: position for position, entity in
+                                              enumerate(unpack_entities(self._warm_start["entities"]))}
+        previous_labels: np.ndarray = self._warm_start["labels"]
+        self._previous_labels = np.array([previous_labels[previous_positions[entity]]
+                                          if entity in previous_positions else -1 for entity in self._entities],
+                                         dtype=np.int32)
+
+        sums: np.ndarray = np.zeros_like(centroids)
+        for start in range(0, len(self._embeddings), ASSIGNMENT_CHUNK_SIZE):
+            labels: np.ndarray = self._previous_labels[start:start + ASSIGNMENT_CHUNK_SIZE]
+            vectors: np.ndarray = self._embeddings[start:start + ASSIGNMENT_CHUNK_SIZE]
+            shared: np.ndarray = labels >= 0
+            membership: sparse.csr_matrix = sparse.csr_matrix((np.ones(np.count_nonzero(shared)),
+                                                               (labels[shared], np.flatnonzero(shared))),
+                                                              shape=(self._k, len(labels)))
+            sums += membership @ vectors
+
+        sizes: np.ndarray = np.bincount(self._previous_labels[self._previous_labels >= 0], minlength=self._k)
+        centroids[sizes > 0] = sums[sizes > 0] / sizes[sizes > 0, np.newaxis]
+        return centroids.astype(self._embeddings.dtype)
+
+    def _report_churn(self) -> None:
+        shared: np.ndarray = self._previous_labels >= 0
+        changed: int = int(np.count_nonzero(self._previous_labels[shared] != self._labels[shared]))
+        shared_entities: int = int(np.count_nonzero(shared))
+        churn: float = changed / shared_entities if shared_entities else 0.0
+
+        logging.info(f"[{self.name()}] {changed} of {shared_entities} previously clustered entities "
+                     f"changed their cluster (churn: {churn}), {len(shared) - shared_entities} entities are new")
+        profiling.record("churn", shared_entities=shared_entities, changed_labels=changed, churn=churn,
+                         new_entities=len(shared) - shared_entities,
+                         removed_entities=len(self._warm_start["labels"]) - shared_entities)
+
+    def _assign_to_restored_clusters(self) -> None:
+        self._centroids = self._restored_state["centroids"]
+
+        self._labels = np.empty(len(self._embeddings), dtype=np.int32)
+        for start in range(0, len(self._embeddings), ASSIGNMENT_CHUNK_SIZE):
+            end: int = start + ASSIGNMENT_CHUNK_SIZE
+            self._labels[start:end] = pairwise_distances_argmin(self._embeddings[start:end], self._centroids)
+
+    def _fitted_state(self) -> Dict[str, np.ndarray]:
+        # entities and labels let a later run warm-start from these clusters and compare its assignment
+        return {"algorithm": np.array("kmeans"), "centroids": self._centroids,
+                "entities": pack_entities(self._entities),
+                "labels": np.asarray(self._labels, dtype=np.int32)}
 
     def _map_embeddings_to_clusters(self) -> None:
-        self._clusters = {k: [] for k in range(self._k)}
+        self._assignment = ClusterAssignment(self._labels, self._entities,
+                                             scores=self.distances() if self._with_distances else None,
+                                             parallel_executions=self._parallel_executions)
+        self._assignment.cluster_index()
+
+    def distances(self) -> np.ndarray:
+        return centroid_distances(self._embeddings, self._centroids, self._labels)
 
-        for i, word in enumerate(self._model.vocab):
-            self._clusters[self._kmeans.labels_[i]].append(word)
+    def inertia(self) -> float:
+        return self._kmeans.inertia_
 
     def name(self) -> str:
         return f"k-means-{self._k}"
@@ -0,0 +1,135 @@
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Set, Iterable, Dict
+
+import numpy as np
+from sklearn.metrics import silhouette_score
+
+from clustering.KMeans.kmeans_cluster_builder import KMeansClusterBuilder
+from util.checkpoint import CheckpointStore
+from util.model_io import load_model, model_fingerprint
+from util.shared_matrix import SharedMatrix, share_matrix
+from util.utils import measure
+
+
+class KMeansSweepResult(NamedTuple):
+    k: int
+    inertia: float
+    silhouette: float
+    seconds: float
+
+
+class KMeansSweepWorker:
+
+    def __init__(self, input_model_path: Path, matrix: SharedMatrix, parallel_executions: int,
+                 silhouette_sample_size: int):
+        self._input_model_path: Path = input_model_path
+        self._matrix: SharedMatrix = matrix
+        self._parallel_executions: int = parallel_executions
+        self._silhouette_sample_size: int = silhouette_sample_size
+
+    def __call__(self, k: int) -> KMeansSweepResult:
+        embeddings: np.ndarray = self._matrix.open()
+
+        start_time: float = time.perf_counter()
+        cluster_builder: KMeansClusterBuilder = KMeansClusterBuilder(self._input_model_path,
+                                                                     self._parallel_executions, k)
+        cluster_builder.use_embeddings(embeddings, [])
+        cluster_builder.train_clusters()
+        seconds: float = time.perf_counter() - start_time
+
+        silhouette: float = silhouette_score(embeddings, cluster_builder.labels(),
+                                             sample_size=min(self._silhouette_sample_size, len(embeddings)),
+                                             random_state=0)
+
+        logging.info(f"[K-{k}] inertia: {cluster_builder.inertia()}; silhouette: {silhouette}")
+        return KMeansSweepResult(k, cluster_builder.inertia(), silhouette, seconds)
+
+
+class KMeansSweep:
+    """Trains k-means for several k on a single load of the model."""
+
+    def __init__(self, input_model_path: Path, parallel_executions: int, k_values: List[int],
+                 silhouette_sample_size: int = 10000, checkpoint_directory: Optional[Path] = None,
+                 resume: bool = False):
+        if resume and not checkpoint_directory:
+            raise Exception("Resuming requires a checkpoint directory")
+
+        self._input_model_path: Path = input_model_path
+        self._parallel_executions: int = parallel_executions
+        self._k_values: List[int] = k_values
+        self._silhouette_sample_size: int = silhouette_sample_size
+        self._results: List[KMeansSweepResult] = []
+        self._checkpoint_directory: Optional[Path] = checkpoint_directory
+        self._resume: bool = resume
+        self._input_model_fingerprint: Optional[str] = None
+
+    def run(self) -> List[KMeansSweepResult]:
+        checkpoints: Optional[CheckpointStore] = CheckpointStore(self._checkpoint_directory, self._checkpoint_key()) \
+            if self._checkpoint_directory else None
+        self._results = self._resume_results(checkpoints) if self._resume else []
+        finished_k_values: Set[int] = {result.k for result in self._results}
+        k_values: List[int] = [k for k in self._k_values if k not in finished_k_values]
+
+        if k_values:
+            self._sweep(k_values, checkpoints)
+
+        self._results.sort(key=lambda result: self._k_values.index(result.k))
+        return self._results
+
+    def _sweep(self, k_values: List[int], checkpoints: Optional[CheckpointStore]) -> None:
+        embeddings: np.ndarray = measure(lambda: load_model(self._input_model_path).vectors, "loading model")
+        concurrent_trainings: int = max(1, min(self._parallel_executions, len(k_values)))
+
+        with share_matrix(embeddings) as matrix:
+            del embeddings
+
+            # the trainings split the thread budget, k-means parallelizes through joblib, which falls back to a
+            # single thread inside the daemonic workers of multiprocessing.Pool
+            worker: KMeansSweepWorker = KMeansSweepWorker(self._input_model_path, matrix,
+                                                          max(1, self._parallel_executions // concurrent_trainings),
+                                                          self._silhouette_sample_size)
+            with ProcessPoolExecutor(max_workers=concurrent_trainings) as executor:
+                measure(lambda: self._collect_results((future.result() for future in
+                                                       as_completed([executor.submit(worker, k) for k in k_values])),
+                                                      checkpoints),
+                        "sweeping k")
+
+    def _collect_results(self, results: Iterable[KMeansSweepResult], checkpoints: Optional[CheckpointStore]) -> None:
+        for result in results:
+            self._results.append(result)
+            if checkpoints:
+                checkpoints.save(f"k-{result.k}",
+                                 **{field: np.array(value) for field, value in result._asdict().items()})
+
+    def _resume_results(self, checkpoints: CheckpointStore) -> List[KMeansSweepResult]:
+        results: List[KMeansSweepResult] = []
+
+        for item in checkpoints.items():
+            checkpoint: Dict[str, np.ndarray] = checkpoints.load(item)
+            results.append(KMeansSweepResult(int(checkpoint["k"]), float(checkpoint["inertia"]),
+                                             float(checkpoint["silhouette"]), float(checkpoint["seconds"])))
+
+        logging.info(f"Resuming with {len(results)} values of k from checkpoints")
+        return [result for result in results if result.k in self._k_values]
+
+    def _checkpoint_key(self) -> str:
+        if self._input_model_fingerprint is None:
+            self._input_model_fingerprint = model_fingerprint(self._input_model_path)
+
+        return f"{self._input_model_fingerprint}.sweep-{self._silhouette_sample_size}"
+
+    def write(self, output_directory: Path) -> Path:
+        output_path: Path = Path(output_directory.absolute(), f"{self.name()}.csv")
+
+        with open(output_path, "w+") as output:
+            print("k,inertia,silhouette,seconds", file=output)
+            for result in self._results:
+                print(f"{result.k},{result.inertia},{result.silhouette},{result.seconds}", file=output)
+
+        return output_path
+
+    def name(self) -> str:
+        return f"k-means-sweep"
@@ -1,32 +1,168 @@
+import logging
 from multiprocessing.pool import Pool
 from pathlib import Path
-from typing import List, Iterable, Dict
+from typing import List, Dict, Optional, Tuple, Callable
+
+import numpy as np
 
 from clustering.SimDim.simdim_cluster_worker import SimDimClusterWorker
+from clustering.SimDim.simdim_numpy_cluster_worker import SimDimNumpyClusterWorker
+from clustering.SimDim.simdim_shared_cluster_worker import SimDimSharedClusterWorker
+from clustering.SimDim.sort_index import load_or_create_sort_index
 from clustering.abstract_cluster_builder import AbstractClusterBuilder
+from clustering.cluster_assignment import ClusterAssignment
+from util import profiling
+from util.checkpoint import CheckpointStore
+from util.process_worker import initialize_worker, call_worker
+from util.profiling import TimedCall
+from util.shared_matrix import share_matrix, SharedMatrix
+from util.utils import measure
+
+SIMDIM_ENGINES = {"python": SimDimClusterWorker,
+                  "numpy": SimDimNumpyClusterWorker}
 
 
 class SimDimClusterBuilder(AbstractClusterBuilder):
 
-    def __init__(self, input_model_path: Path, parallel_executions: int):
+    def __init__(self, input_model_path: Path, parallel_executions: int, engine: str = "python",
+                 shared_memory: bool = False, sort_cache_directory: Optional[Path] = None,
+                 column_directory: Optional[Path] = None, checkpoint_directory: Optional[Path] = None,
+                 resume: bool = False):
         super(SimDimClusterBuilder, self).__init__(input_model_path, parallel_executions)
 
+        if engine not in SIMDIM_ENGINES:
+            raise Exception(f"Invalid SimDim engine '{engine}'. Choose from {', '.join(SIMDIM_ENGINES)}")
+        if sort_cache_directory and engine == "python" and not shared_memory and not column_directory:
+            raise Exception("A sort cache requires the numpy engine, shared memory or streamed columns")
+        if resume and not checkpoint_directory:
+            raise Exception("Resuming requires a checkpoint directory")
+
+        self._engine: str = engine
+        self._shared_memory: bool = shared_memory
+        self._sort_cache_directory: Optional[Path] = sort_cache_directory
+        self._sort_index_path: Optional[Path] = None
+        self._column_directory: Optional[Path] = column_directory
+        self._cluster_consumer: Optional[Callable[[int, np.ndarray], None]] = None
+        self._checkpoint_directory: Optional[Path] = checkpoint_directory
+        self._resume: bool = resume
+
     def _train_specific_clusters(self) -> None:
-        self._clusters: Dict[int, Iterable[str]] = {}
+        if self._shared_memory or self._column_directory or self._shared_matrix:
+            self._train_shared_clusters()
+            return
+
+        self._sort_dimensions()
+        worker = SimDimNumpyClusterWorker(self._embeddings, self._sort_index_path) \
+            if self._sort_index_path else SIMDIM_ENGINES[self._engine](self._embeddings)
+        self._assign_extracted_clusters(self._extract_clusters(worker))
+
+    def _train_shared_clusters(self) -> None:
+        if self._shared_matrix and not self._column_directory:
+            self._extract_shared_clusters(self._shared_matrix)
+            return
+
+        # streamed columns go to a column-major file on disk instead of shared memory: every worker reads its
+        # dimension as one sequential block and only the pages of that column have to be resident
+        with share_matrix(self._embeddings, self._column_directory, "F" if self._column_directory else "C") as matrix:
+            # continue on the shared copy so that only a single copy of the vectors stays resident
+            self._embeddings = matrix.open()
+            self._extract_shared_clusters(matrix)
+
+    def _extract_shared_clusters(self, matrix: SharedMatrix) -> None:
+        self._sort_dimensions()
+        worker: SimDimSharedClusterWorker = SimDimSharedClusterWorker(matrix, self._sort_index_path)
+        self._assign_extracted_clusters(self._extract_clusters(worker))
+
+    def _sort_dimensions(self) -> None:
+        if self._sort_cache_directory:
+            self._sort_index_path = measure(lambda: load_or_create_sort_index(self._sort_cache_directory,
+                                                                              self._model_fingerprint(),
+                                                                              self._embeddings,
+                                                                              self._parallel_executions),
+                                            "sorting dimensions")
+
+    def stream_clusters(self, consumer: Callable[[int, np.ndarray], None]) -> None:
+        """Hand every cluster as ``(dimension, entity indices)`` to ``consumer`` as soon as it is found."""
+        self._cluster_consumer = consumer
+
+    def _extract_clusters(self, worker: Callable[[int], Optional[Tuple[int, np.ndarray]]]) \
+            -> List[Optional[Tuple[int, np.ndarray]]]:
+        checkpoints: Optional[CheckpointStore] = CheckpointStore(self._checkpoint_directory,
+                                                                 f"{self._model_fingerprint()}.simdim") \
+            if self._checkpoint_directory else None
+        clusters: Dict[int, Optional[Tuple[int, np.ndarray]]] = self._resume_clusters(checkpoints) \
+            if self._resume else {}
+        remaining_dimensions: List[int] = [dimension for dimension in range(self._embeddings.shape[1])
+                                           if dimension not in clusters]
+
+        for cluster in filter(None, clusters.values()):
+            if self._cluster_consumer:
+                self._cluster_consumer(*cluster)
 
-        dimensions: Iterable[int] = (dimension for dimension in range(self._model.vector_size))
-        with Pool(processes=self._parallel_executions) as pool:
-            clusters: List[Dict[int, Iterable[str]]] = pool.map(SimDimClusterWorker(self._model), dimensions)
+        # engines without shared memory hold the whole matrix, so every worker process receives it once up front
+        # and the tasks carry nothing but their dimension
+        with Pool(processes=self._parallel_executions, initializer=initialize_worker,
+                  initargs=(TimedCall(worker),)) as pool:
+            for dimension, cluster, wall_seconds, cpu_seconds in pool.imap_unordered(call_worker,
+                                                                                     remaining_dimensions):
+                profiling.record("dimensions", dimension=dimension, wall_seconds=wall_seconds,
+                                 cpu_seconds=cpu_seconds)
+                clusters[dimension] = cluster
 
-        for cluster in clusters:
-            if not cluster:
-                continue
+                if checkpoints:
+                    checkpoints.save(f"dimension-{dimension}", found=np.array(cluster is not None),
+                                     entity_indices=cluster[1] if cluster else np.empty(0, dtype=np.int64))
+                if cluster and self._cluster_consumer:
+                    self._cluster_consumer(*cluster)
 
-            dimension: int = list(cluster.keys())[0]
-            self._clusters[dimension] = cluster[dimension]
+        return list(clusters.values())
+
+    @staticmethod
+    def _resume_clusters(checkpoints: CheckpointStore) -> Dict[int, Optional[Tuple[int, np.ndarray]]]:
+        clusters: Dict[int, Optional[Tuple[int, np.ndarray]]] = {}
+
+        for item in checkpoints.items():
+            dimension: int = int(item[len("dimension-"):])
+            checkpoint: Dict[str, np.ndarray] = checkpoints.load(item)
+            clusters[dimension] = (dimension, checkpoint["entity_indices"]) if checkpoint["found"] else None
+
+        logging.info(f"Resuming with {len(clusters)} dimensions from checkpoints")
+        return clusters
+
+    def _assign_extracted_clusters(self, clusters: List[Optional[Tuple[int, np.ndarray]]]) -> None:
+        # every worker returns the entity indices of the densest window of its dimension, if it found one
+        memberships: Dict[int, np.ndarray] = {dimension: entity_indices
+                                              for dimension, entity_indices in filter(None, clusters)}
+        self._assignment = ClusterAssignment.from_memberships(memberships, self._entities)
+
+    def _assign_to_restored_clusters(self) -> None:
+        memberships: Dict[int, np.ndarray] = {}
+
+        for dimension, lower_bound, upper_bound in zip(self._restored_state["dimensions"].tolist(),
+                                                       self._restored_state["lower_bounds"].tolist(),
+                                                       self._restored_state["upper_bounds"].tolist()):
+            column: np.ndarray = self._embeddings[:, dimension]
+            memberships[dimension] = np.flatnonzero((column >= lower_bound) & (column <= upper_bound))
+
+        self._assignment = ClusterAssignment.from_memberships(memberships, self._entities)
+
+    def _fitted_state(self) -> Dict[str, np.ndarray]:
+        dimensions: List[int] = []
+        bounds: List[Tuple[float, float]] = []
+
+        for dimension, members in self._assignment:
+            values: np.ndarray = self._embeddings[members.entity_indices, dimension]
+            dimensions.append(dimension)
+            bounds.append((values.min(), values.max()))
+
+        return {"algorithm": np.array("simdim"),
+                "dimensions": np.array(dimensions, dtype=np.int32),
+                "lower_bounds": np.array([lower_bound for lower_bound, _ in bounds]),
+                "upper_bounds": np.array([upper_bound for _, upper_bound in bounds])}
 
     def _map_embeddings_to_clusters(self) -> None:
-        pass
+        self._assignment.cluster_index()
 
     def name(self) -> str:
         return f"SIMDIM"
+
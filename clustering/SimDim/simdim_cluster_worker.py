@@ -2,21 +2,21 @@ import logging
 import statistics
 import time
 from math import ceil
-from typing import List, Tuple, Optional, Dict
+from typing import List, Tuple, Optional
 
-from gensim.models import KeyedVectors
+import numpy as np
 
 
 class SimDimClusterWorker:
 
-    def __init__(self, model: KeyedVectors):
-        self._model: KeyedVectors = model
-        self._minimum_cluster_size: int = max(10, len(self._model.vectors) // (self._model.vector_size * 10))
+    def __init__(self, embeddings: np.ndarray):
+        self._embeddings: np.ndarray = embeddings
+        self._minimum_cluster_size: int = max(10, len(self._embeddings) // (self._embeddings.shape[1] * 10))
 
         # state for cluster extraction
         self._dimension: int = 0
         self._sorted_values: List[float] = []
-        self._sorted_labels: List[str] = []
+        self._sorted_indices: List[int] = []
         self._tolerance: float = 0.0
         self._biggest_cluster: Tuple[int, int] = (0, 0)
         self._current_cluster: Tuple[int, int] = (0, 0)
@@ -26,18 +26,18 @@ class SimDimClusterWorker:
     def __call__(self, dimension: int):
         return self.extract_cluster(dimension)
 
-    def extract_cluster(self, dimension: int) -> Optional[Dict[int, List[str]]]:
+    def extract_cluster(self, dimension: int) -> Optional[Tuple[int, np.ndarray]]:
         self._dimension = dimension
 
         logging.info(f"[DIMENSION-{self._dimension}] begin")
 
-        vector_values: List[float] = [vector[self._dimension].item() for vector in self._model.vectors]
-        vector_labels: List[str] = list(self._model.vocab.keys())
+        vector_values: List[float] = [vector[self._dimension].item() for vector in self._embeddings]
+        vector_indices: List[int] = list(range(len(vector_values)))
 
-        sorted_tuples: List[Tuple[float, str]] = sorted(zip(vector_values, vector_labels), key=lambda x: x[0])
+        sorted_tuples: List[Tuple[float, int]] = sorted(zip(vector_values, vector_indices), key=lambda x: x[0])
 
         self._sorted_values = [x[0] for x in sorted_tuples]
-        self._sorted_labels = [x[1] for x in sorted_tuples]
+        self._sorted_indices = [x[1] for x in sorted_tuples]
         self._tolerance = statistics.mean(self._sorted_values) / 2
         self._tolerance = self._calculate_tolerance()
         self._create_biggest_cluster()
@@ -49,8 +49,7 @@ class SimDimClusterWorker:
         if self._len(self._biggest_cluster) < self._minimum_cluster_size:
             return None
 
-        return {self._dimension: [self._sorted_labels[label_index]
-                                  for label_index in range(self._biggest_cluster[0], self._biggest_cluster[1])]}
+        return self._dimension, np.array(self._sorted_indices[self._biggest_cluster[0]:self._biggest_cluster[1]])
 
     def _calculate_tolerance(self):
         tolerance: float = 0
@@ -0,0 +1,88 @@
+import logging
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+from clustering.SimDim.sort_index import load_sorted_order
+
+
+class SimDimNumpyClusterWorker:
+    """Vectorized counterpart of ``SimDimClusterWorker`` producing the same clusters."""
+
+    def __init__(self, embeddings: np.ndarray, sort_index_path: Optional[Path] = None):
+        self._embeddings: np.ndarray = embeddings
+        self._sort_index_path: Optional[Path] = sort_index_path
+        self._minimum_cluster_size: int = self.minimum_cluster_size(*self._embeddings.shape)
+
+    def __call__(self, dimension: int):
+        return self.extract_cluster(dimension)
+
+    def extract_cluster(self, dimension: int) -> Optional[Tuple[int, np.ndarray]]:
+        logging.info(f"[DIMENSION-{dimension}] begin")
+
+        order: Optional[np.ndarray] = load_sorted_order(self._sort_index_path, dimension) \
+            if self._sort_index_path else None
+        entity_indices: Optional[np.ndarray] = densest_window(dimension, self._embeddings[:, dimension],
+                                                              self._minimum_cluster_size, order)
+
+        logging.info(f"[DIMENSION-{dimension}] done")
+
+        if entity_indices is None:
+            return None
+
+        return dimension, entity_indices
+
+    @staticmethod
+    def minimum_cluster_size(number_of_entities: int, number_of_dimensions: int) -> int:
+        return max(10, number_of_entities // (number_of_dimensions * 10))
+
+
+def densest_window(dimension: int, column: np.ndarray, minimum_cluster_size: int,
+                   order: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+    """Return the entity indices of the largest window of ``column`` fitting into the SimDim tolerance.
+
+    ``order`` may pass a precomputed stable argsort of ``column`` to skip sorting.
+    """
+    if order is None:
+        order = np.argsort(column, kind="stable")
+    sorted_values: np.ndarray = column[order].astype(np.float64)
+    number_of_values: int = len(sorted_values)
+
+    tolerance: float = np.abs(np.diff(sorted_values)).sum() / (number_of_values - 1)
+    tolerance *= minimum_cluster_size / 10
+
+    # index of the first value exceeding the tolerance for every possible window start
+    ends: np.ndarray = np.searchsorted(sorted_values, sorted_values + tolerance, side="right")
+    ends = _correct_rounding(sorted_values, ends, tolerance)
+    # the iterative search never includes the very last value, mirror that here
+    ends = np.minimum(ends, number_of_values - 1)
+
+    lengths: np.ndarray = ends - np.arange(number_of_values)
+    start: int = int(np.argmax(lengths))
+
+    logging.info(f"[DIMENSION-{dimension}] tolerance: {tolerance}")
+    logging.info(f"[DIMENSION-{dimension}] mean: {sorted_values.mean()}")
+
+    # the iterative search only accepts windows strictly longer than the minimum cluster size
+    if lengths[start] <= minimum_cluster_size:
+        return None
+
+    return order[start:ends[start]]
+
+
+def _correct_rounding(sorted_values: np.ndarray, ends: np.ndarray, tolerance: float) -> np.ndarray:
+    # searchsorted compares ``value <= start + tolerance`` while the iterative search compares
+    # ``value - start <= tolerance``; both may disagree by one ulp at the window boundary
+    starts: np.ndarray = np.arange(len(sorted_values))
+    last_index: int = len(sorted_values) - 1
+
+    inside: np.ndarray = sorted_values[np.minimum(ends, last_index)] - sorted_values <= tolerance
+    extend: np.ndarray = (ends <= last_index) & inside
+    ends[extend] = np.searchsorted(sorted_values, sorted_values[ends[extend]], side="right")
+
+    outside: np.ndarray = sorted_values[ends - 1] - sorted_values > tolerance
+    shrink: np.ndarray = (ends - 1 > starts) & outside
+    ends[shrink] = np.searchsorted(sorted_values, sorted_values[ends[shrink] - 1], side="left")
+
+    return ends
@@ -0,0 +1,40 @@
+import logging
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+from clustering.SimDim.simdim_numpy_cluster_worker import SimDimNumpyClusterWorker, densest_window
+from clustering.SimDim.sort_index import load_sorted_order
+from util.shared_matrix import SharedMatrix
+
+
+class SimDimSharedClusterWorker:
+    """SimDim worker reading its dimension from a ``SharedMatrix`` instead of a pickled model.
+
+    Only the matrix handle travels to the worker processes and clusters are returned as
+    entity indices, which keeps both directions of the inter-process traffic small.
+    """
+
+    def __init__(self, matrix: SharedMatrix, sort_index_path: Optional[Path] = None):
+        self._matrix: SharedMatrix = matrix
+        self._sort_index_path: Optional[Path] = sort_index_path
+        self._minimum_cluster_size: int = SimDimNumpyClusterWorker.minimum_cluster_size(*self._matrix.shape)
+
+    def __call__(self, dimension: int):
+        return self.extract_cluster(dimension)
+
+    def extract_cluster(self, dimension: int) -> Optional[Tuple[int, np.ndarray]]:
+        logging.info(f"[DIMENSION-{dimension}] begin")
+
+        column: np.ndarray = np.array(self._matrix.open()[:, dimension])
+        order: Optional[np.ndarray] = load_sorted_order(self._sort_index_path, dimension) \
+            if self._sort_index_path else None
+        entity_indices: Optional[np.ndarray] = densest_window(dimension, column, self._minimum_cluster_size, order)
+
+        logging.info(f"[DIMENSION-{dimension}] done")
+
+        if entity_indices is None:
+            return None
+
+        return dimension, entity_indices
@@ -0,0 +1,43 @@
+import logging
+import os
+from multiprocessing.pool import ThreadPool
+from pathlib import Path
+
+import numpy as np
+
+SORT_INDEX_SUFFIX = ".sortindex.npy"
+
+
+def load_or_create_sort_index(cache_directory: Path, fingerprint: str, embeddings: np.ndarray,
+                              parallel_executions: int) -> Path:
+    """Return the path of a (dimensions x entities) int32 matrix holding the stable argsort of every column.
+
+    The matrix is keyed by the model fingerprint, so it is computed once per model and reused by later runs.
+    """
+    index_path: Path = Path(cache_directory.absolute(), f"{fingerprint}{SORT_INDEX_SUFFIX}")
+
+    if index_path.exists():
+        logging.info(f"Reusing sort index '{index_path}'")
+        return index_path
+
+    temporary_path: Path = index_path.with_name(f"{index_path.name}.{os.getpid()}.tmp")
+    index: np.ndarray = np.lib.format.open_memmap(str(temporary_path), mode="w+", dtype=np.int32,
+                                                  shape=(embeddings.shape[1], embeddings.shape[0]))
+
+    def sort_dimension(dimension: int) -> None:
+        index[dimension] = np.argsort(embeddings[:, dimension], kind="stable")
+
+    # numpy releases the GIL while sorting, so threads suffice and avoid copying the embeddings
+    with ThreadPool(processes=parallel_executions) as pool:
+        pool.map(sort_dimension, range(embeddings.shape[1]))
+
+    index.flush()
+    del index
+    os.replace(str(temporary_path), str(index_path))
+
+    logging.info(f"Created sort index '{index_path}'")
+    return index_path
+
+
+def load_sorted_order(index_path: Path, dimension: int) -> np.ndarray:
+    return np.array(np.load(str(index_path), mmap_mode="r")[dimension])
@@ -1,9 +1,16 @@
+import logging
 from abc import abstractmethod, ABC
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, Optional, Sequence, Mapping, List
 
-from gensim.models import KeyedVectors
+import numpy as np
 
+from clustering.cluster_assignment import ClusterAssignment
+from util import profiling
+from util.dimensionality_reduction import DimensionalityReduction, Projection, load_or_reduce
+from util.embedding_storage import prepare_embeddings
+from util.model_io import load_model, model_fingerprint
+from util.shared_matrix import SharedMatrix
 from util.utils import measure
 
 
@@ -12,16 +19,118 @@ class AbstractClusterBuilder(ABC):
     def __init__(self, input_model_path: Path, parallel_executions: int):
         self._input_model_path: Path = input_model_path
         self._parallel_executions: int = parallel_executions
-        self._clusters: Dict[int, List[str]] = {}
+        self._embeddings: Optional[np.ndarray] = None
+        self._entities: Sequence[str] = []
+        self._labels: Optional[np.ndarray] = None
+        self._assignment: Optional[ClusterAssignment] = None
+        self._restored_state: Optional[Mapping[str, np.ndarray]] = None
+        self._shared_matrix: Optional[SharedMatrix] = None
+        self._reduction: Optional[DimensionalityReduction] = None
+        self._reduction_cache_directory: Optional[Path] = None
+        self._projection: Optional[Projection] = None
+        self._dtype: Optional[str] = None
+        self._normalize: bool = False
+        # hashing reads the whole model, every cache and checkpoint key of a run reuses the first hash
+        self._input_model_fingerprint: Optional[str] = None
+
+    def use_embeddings(self, embeddings: np.ndarray, entities: Sequence[str]) -> None:
+        """Cluster already loaded embeddings instead of loading the input model again."""
+        self._embeddings = embeddings
+        self._entities = entities
+
+    def use_shared_matrix(self, matrix: SharedMatrix, entities: Sequence[str]) -> None:
+        """Cluster embeddings another process already shared, builders with workers hand on the handle."""
+        self._shared_matrix = matrix
+        self.use_embeddings(matrix.open(), entities)
 
     def build_clusters(self) -> None:
-        measure(self._load_model, "loading model")
-        measure(self._train_specific_clusters, "clustering")
+        self.train_clusters()
         measure(self._map_embeddings_to_clusters, "mapping entities to clusters")
 
+    def store_embeddings(self, dtype: Optional[str] = None, normalize: bool = False) -> None:
+        """Cluster the embeddings converted to ``dtype`` and, with ``normalize``, scaled to unit length."""
+        self._dtype = dtype
+        # restored states of normalized runs already require normalization
+        self._normalize = self._normalize or normalize
+
+    def reduce_dimensions(self, reduction: DimensionalityReduction, cache_directory: Optional[Path] = None) -> None:
+        """Cluster a projection of the embeddings onto fewer dimensions, optionally cached in ``cache_directory``."""
+        self._reduction = reduction
+        self._reduction_cache_directory = cache_directory
+
+    def train_clusters(self) -> None:
+        if self._embeddings is None:
+            measure(self._load_model, "loading model")
+
+        if self._dtype or self._normalize:
+            measure(self._prepare_embeddings, "preparing embeddings")
+
+        if self._restored_state is None:
+            if self._reduction:
+                measure(self._reduce_embeddings, "reducing dimensions")
+            measure(self._train_specific_clusters, "clustering")
+        else:
+            if "projection_components" in self._restored_state:
+                measure(self._project_onto_restored_dimensions, "reducing dimensions")
+            measure(self._assign_to_restored_clusters, "assigning entities to restored clusters")
+
+    def save_state(self, output_directory: Path) -> Path:
+        state_path: Path = Path(output_directory.absolute(), f"{self.name()}.state.npz")
+        state: Dict[str, np.ndarray] = self._fitted_state()
+        if self._projection is not None:
+            # restored clusters live in the reduced space, new entities have to be projected the same way
+            state.update(projection_components=self._projection.components, projection_mean=self._projection.mean)
+        if self._normalize:
+            state.update(normalize=np.array(True))
+
+        np.savez(str(state_path), **state)
+        return state_path
+
+    def restore_state(self, state: Mapping[str, np.ndarray]) -> None:
+        """Assign entities to the clusters of a previous run instead of training new clusters."""
+        self._restored_state = state
+        self._normalize = self._normalize or bool(state.get("normalize", False))
+
     def _load_model(self) -> None:
-        self._model = KeyedVectors.load_word2vec_format(str(self._input_model_path.absolute()))
-        self._embeddings = self._model.vectors
+        model = load_model(self._input_model_path)
+        self.use_embeddings(model.vectors, model.index2word)
+
+    def _prepare_embeddings(self) -> None:
+        embeddings: np.ndarray = prepare_embeddings(self._embeddings, self._dtype, self._normalize)
+        if embeddings is not self._embeddings:
+            self._shared_matrix = None
+        self._embeddings = embeddings
+
+    def _reduce_embeddings(self) -> None:
+        self._embeddings, self._projection = load_or_reduce(self._embeddings, self._reduction,
+                                                            self._reduction_cache_directory,
+                                                            self._model_fingerprint(with_reduction=False))
+        # a shared matrix holds the original vectors, workers have to get the reduced ones
+        self._shared_matrix = None
+
+        logging.info(f"Reduced to {self._reduction.dimensions} dimensions with {self._reduction.method}, "
+                     f"explained variance: {self._projection.explained_variance}")
+        profiling.record("reduction", **self._reduction._asdict(),
+                         explained_variance=self._projection.explained_variance)
+
+    def _project_onto_restored_dimensions(self) -> None:
+        self._projection = Projection(self._restored_state["projection_components"],
+                                      self._restored_state["projection_mean"], float("nan"))
+        self._embeddings = self._projection.transform(self._embeddings)
+        self._shared_matrix = None
+
+    def _model_fingerprint(self, with_reduction: bool = True) -> str:
+        """Key for on-disk caches derived from the embeddings, including their preprocessing."""
+        preprocessing: List[str] = [self._dtype] if self._dtype else []
+        if self._normalize:
+            preprocessing.append("normalized")
+        if self._reduction and with_reduction:
+            preprocessing.append(self._reduction.key())
+
+        if self._input_model_fingerprint is None:
+            self._input_model_fingerprint = model_fingerprint(self._input_model_path)
+
+        return ".".join([self._input_model_fingerprint] + preprocessing)
 
     @abstractmethod
     def _train_specific_clusters(self) -> None:
@@ -31,9 +140,28 @@ class AbstractClusterBuilder(ABC):
     def _map_embeddings_to_clusters(self) -> None:
         raise NotImplementedError
 
+    @abstractmethod
+    def _fitted_state(self) -> Dict[str, np.ndarray]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def _assign_to_restored_clusters(self) -> None:
+        raise NotImplementedError
+
     @abstractmethod
     def name(self) -> str:
         raise NotImplementedError
 
-    def clusters(self) -> Dict[int, List[str]]:
-        return self._clusters
+    def clusters(self) -> Optional[ClusterAssignment]:
+        if self._assignment is None and self._labels is not None:
+            self._assignment = ClusterAssignment(self._labels, self._entities,
+                                                 parallel_executions=self._parallel_executions)
+
+        return self._assignment
+
+    def labels(self) -> Optional[np.ndarray]:
+        """Cluster label per entity, ``None`` for builders whose clusters may overlap."""
+        return self._labels
+
+    def entities(self) -> Sequence[str]:
+        return self._entities
@@ -0,0 +1,139 @@
+from typing import Sequence, Optional, Iterator, Tuple, List, Dict, overload, Union
+
+import numpy as np
+
+from clustering.cluster_index import ClusterIndex
+
+LOOKUP_CHUNK_SIZE = 10000
+
+
+class ClusterView(Sequence[str]):
+    """Lazy view on the entities of one cluster, strings are looked up while iterating."""
+    __slots__ = ("cluster_id", "entity_indices", "_entities")
+
+    def __init__(self, cluster_id: int, entity_indices: np.ndarray, entities: Sequence[str]):
+        self.cluster_id: int = cluster_id
+        self.entity_indices: np.ndarray = entity_indices
+        self._entities: Sequence[str] = entities
+
+    def __len__(self) -> int:
+        return len(self.entity_indices)
+
+    def __iter__(self) -> Iterator[str]:
+        for start in range(0, len(self.entity_indices), LOOKUP_CHUNK_SIZE):
+            yield from (self._entities[index] for index in
+                        self.entity_indices[start:start + LOOKUP_CHUNK_SIZE].tolist())
+
+    @overload
+    def __getitem__(self, position: int) -> str:
+        ...
+
+    @overload
+    def __getitem__(self, positions: slice) -> List[str]:
+        ...
+
+    def __getitem__(self, position: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(position, slice):
+            return [self._entities[index] for index in self.entity_indices[position].tolist()]
+        return self._entities[int(self.entity_indices[position])]
+
+
+class ClusterAssignment:
+    """Result of a cluster builder, kept as a few arrays instead of one Python list per cluster.
+
+    Every row assigns the entity ``entity_indices[row]`` to the cluster ``labels[row]`` and may carry a
+    ``scores[row]``, e.g. the distance to the centroid. Without ``entity_indices`` row ``i`` is entity ``i``,
+    which fits partitioning builders; overlapping clusters (SimDim) list one row per membership.
+    """
+    __slots__ = ("labels", "entities", "entity_indices", "scores", "_parallel_executions", "_cluster_index",
+                 "_entity_positions", "_rows_by_entity")
+
+    def __init__(self, labels: np.ndarray, entities: Sequence[str], entity_indices: Optional[np.ndarray] = None,
+                 scores: Optional[np.ndarray] = None, parallel_executions: int = 1):
+        self.labels: np.ndarray = labels
+        self.entities: Sequence[str] = entities
+        self.entity_indices: Optional[np.ndarray] = entity_indices
+        self.scores: Optional[np.ndarray] = scores
+        self._parallel_executions: int = parallel_executions
+        self._cluster_index: Optional[ClusterIndex] = None
+        # built on the first lookup by entity
+        self._entity_positions: Optional[Dict[str, int]] = None
+        self._rows_by_entity: Optional[ClusterIndex] = None
+
+    @staticmethod
+    def from_memberships(memberships: Dict[int, np.ndarray], entities: Sequence[str]) -> "ClusterAssignment":
+        cluster_ids: List[int] = sorted(memberships)
+        labels: np.ndarray = np.repeat(np.array(cluster_ids, dtype=np.int32),
+                                       [len(memberships[cluster_id]) for cluster_id in cluster_ids])
+        entity_indices: np.ndarray = np.concatenate([np.empty(0, dtype=np.int64)] +
+                                                    [memberships[cluster_id] for cluster_id in cluster_ids])
+        return ClusterAssignment(labels, entities, entity_indices.astype(np.int64))
+
+    def cluster_index(self) -> ClusterIndex:
+        if self._cluster_index is None:
+            self._cluster_index = ClusterIndex.from_labels(self.labels, self._parallel_executions)
+        return self._cluster_index
+
+    def entity_index(self) -> ClusterIndex:
+        """Like ``cluster_index()``, but listing the members as entity instead of row indices."""
+        if self.entity_indices is None:
+            return self.cluster_index()
+
+        cluster_index: ClusterIndex = self.cluster_index()
+        return ClusterIndex(cluster_index.cluster_ids, cluster_index.offsets,
+                            self.entity_indices[cluster_index.entity_indices])
+
+    def __len__(self) -> int:
+        return len(self.cluster_index())
+
+    def __iter__(self) -> Iterator[Tuple[int, ClusterView]]:
+        for position, cluster_id in enumerate(self.cluster_index().cluster_ids.tolist()):
+            yield cluster_id, self._view(position)
+
+    def __getitem__(self, cluster_id: int) -> ClusterView:
+        cluster_ids: np.ndarray = self.cluster_index().cluster_ids
+        position: int = int(np.searchsorted(cluster_ids, cluster_id))
+
+        if position == len(cluster_ids) or cluster_ids[position] != cluster_id:
+            raise KeyError(cluster_id)
+        return self._view(position)
+
+    def cluster_ids(self) -> np.ndarray:
+        return self.cluster_index().cluster_ids
+
+    def sizes(self) -> np.ndarray:
+        """Number of entities per cluster, aligned with ``cluster_ids()``."""
+        return self.cluster_index().sizes()
+
+    def clusters_of(self, entity: str) -> List[int]:
+        """Clusters containing ``entity``, empty if it belongs to none."""
+        if self._entity_positions is None:
+            self._entity_positions = {name: position for position, name in enumerate(self.entities)}
+        entity_index: Optional[int] = self._entity_positions.get(entity)
+        if entity_index is None:
+            return []
+        if self.entity_indices is None:
+            return [int(self.labels[entity_index])]
+
+        if self._rows_by_entity is None:
+            # grouping the rows by entity index instead of by label gives the memberships of every entity
+            self._rows_by_entity = ClusterIndex.from_labels(self.entity_indices, self._parallel_executions)
+        position: int = int(np.searchsorted(self._rows_by_entity.cluster_ids, entity_index))
+        if position == len(self._rows_by_entity) or self._rows_by_entity.cluster_ids[position] != entity_index:
+            return []
+
+        start, end = self._rows_by_entity.offsets[position:position + 2].tolist()
+        return self.labels[self._rows_by_entity.entity_indices[start:end]].tolist()
+
+    def row_entities(self, start: int, end: int) -> List[str]:
+        if self.entity_indices is None:
+            return list(self.entities[start:end])
+        return [self.entities[index] for index in self.entity_indices[start:end].tolist()]
+
+    def to_dict(self) -> Dict[int, List[str]]:
+        return {cluster_id: list(members) for cluster_id, members in self}
+
+    def _view(self, position: int) -> ClusterView:
+        rows: np.ndarray = self.cluster_index().members(position)
+        entity_indices: np.ndarray = self.entity_indices[rows] if self.entity_indices is not None else rows
+        return ClusterView(int(self.cluster_index().cluster_ids[position]), entity_indices, self.entities)
@@ -0,0 +1,76 @@
+from multiprocessing.pool import ThreadPool
+from typing import Iterator, Tuple, List
+
+import numpy as np
+
+
+class ClusterIndex:
+    """CSR-style grouping of entity indices by cluster label.
+
+    The members of the cluster at ``position`` are ``entity_indices[offsets[position]:offsets[position + 1]]``,
+    in ascending entity order. Entity strings are only looked up by whoever needs them.
+    """
+
+    def __init__(self, cluster_ids: np.ndarray, offsets: np.ndarray, entity_indices: np.ndarray):
+        self.cluster_ids: np.ndarray = cluster_ids
+        self.offsets: np.ndarray = offsets
+        self.entity_indices: np.ndarray = entity_indices
+
+    @staticmethod
+    def from_labels(labels: np.ndarray, parallel_executions: int = 1) -> "ClusterIndex":
+        if len(labels) == 0:
+            return ClusterIndex(np.empty(0, dtype=np.int64), np.zeros(1, dtype=np.int64),
+                                np.empty(0, dtype=np.int64))
+
+        minimum_label: int = int(labels.min())
+        shifted_labels: np.ndarray = labels - minimum_label
+        number_of_labels: int = int(shifted_labels.max()) + 1
+        if number_of_labels <= np.iinfo(np.uint16).max:
+            # numpy radix-sorts 16 bit keys, which is several times faster than sorting wider integers
+            shifted_labels = shifted_labels.astype(np.uint16)
+
+        chunk_bounds: List[Tuple[int, int]] = [(chunk[0], chunk[-1] + 1) for chunk in
+                                               np.array_split(np.arange(len(labels)), parallel_executions)
+                                               if len(chunk)]
+
+        def sort_chunk(bounds: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+            chunk_labels: np.ndarray = shifted_labels[bounds[0]:bounds[1]]
+            return (np.argsort(chunk_labels, kind="stable") + bounds[0],
+                    np.bincount(chunk_labels, minlength=number_of_labels))
+
+        with ThreadPool(processes=len(chunk_bounds)) as pool:
+            sorted_chunks: List[Tuple[np.ndarray, np.ndarray]] = pool.map(sort_chunk, chunk_bounds)
+
+        # counting sort across chunks: chunk i writes each cluster right after the members of chunks before it
+        chunk_counts: np.ndarray = np.stack([counts for _, counts in sorted_chunks])
+        sizes: np.ndarray = chunk_counts.sum(axis=0)
+        cluster_offsets: np.ndarray = np.concatenate(([0], np.cumsum(sizes)))
+        chunk_offsets: np.ndarray = cluster_offsets[:-1] + np.cumsum(chunk_counts, axis=0) - chunk_counts
+        entity_indices: np.ndarray = np.empty(len(labels), dtype=np.int64)
+
+        def scatter_chunk(chunk: int) -> None:
+            chunk_order, counts = sorted_chunks[chunk]
+            chunk_labels: np.ndarray = np.repeat(np.arange(number_of_labels), counts)
+            ranks: np.ndarray = np.arange(len(chunk_order)) - (np.cumsum(counts) - counts)[chunk_labels]
+            entity_indices[chunk_offsets[chunk, chunk_labels] + ranks] = chunk_order
+
+        with ThreadPool(processes=len(chunk_bounds)) as pool:
+            pool.map(scatter_chunk, range(len(sorted_chunks)))
+
+        present: np.ndarray = np.flatnonzero(sizes)
+        return ClusterIndex(present + minimum_label,
+                            np.concatenate(([0], np.cumsum(sizes[present]))),
+                            entity_indices)
+
+    def __len__(self) -> int:
+        return len(self.cluster_ids)
+
+    def __iter__(self) -> Iterator[Tuple[int, np.ndarray]]:
+        for position, cluster_id in enumerate(self.cluster_ids.tolist()):
+            yield cluster_id, self.members(position)
+
+    def sizes(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def members(self, position: int) -> np.ndarray:
+        return self.entity_indices[self.offsets[position]:self.offsets[position + 1]]
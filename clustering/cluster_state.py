@@ -0,0 +1,40 @@
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+
+from clustering.DBScan.dbscan_cluster_builder import DBScanClusterBuilder
+from clustering.KMeans.hkmeans_cluster_builder import HKMeansClusterBuilder
+from clustering.KMeans.kmeans_cluster_builder import KMeansClusterBuilder
+from clustering.SimDim.simdim_cluster_builder import SimDimClusterBuilder
+from clustering.abstract_cluster_builder import AbstractClusterBuilder
+
+
+def load_state(state_path: Path) -> Dict[str, np.ndarray]:
+    with np.load(str(state_path.absolute())) as state_file:
+        return dict(state_file)
+
+
+def restore_cluster_builder(state_path: Path, input_model_path: Path, parallel_executions: int,
+                            with_distances: bool = False) -> AbstractClusterBuilder:
+    """Create the builder that saved ``state_path``, set up to assign new entities to its clusters."""
+    state: Dict[str, np.ndarray] = load_state(state_path)
+    algorithm: str = str(state["algorithm"])
+
+    if algorithm == "kmeans":
+        cluster_builder: AbstractClusterBuilder = KMeansClusterBuilder(input_model_path, parallel_executions,
+                                                                       len(state["centroids"]),
+                                                                       with_distances=with_distances)
+    elif algorithm == "hkmeans":
+        cluster_builder = HKMeansClusterBuilder(input_model_path, parallel_executions, len(state["centroids"]),
+                                                with_distances=with_distances)
+    elif algorithm == "dbscan":
+        cluster_builder = DBScanClusterBuilder(input_model_path, parallel_executions,
+                                               float(state["eps"]), str(state["metric"]))
+    elif algorithm == "simdim":
+        cluster_builder = SimDimClusterBuilder(input_model_path, parallel_executions)
+    else:
+        raise Exception(f"'{state_path.absolute()}' contains state of unknown algorithm '{algorithm}'")
+
+    cluster_builder.restore_state(state)
+    return cluster_builder
@@ -0,0 +1,126 @@
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, NamedTuple, Sequence, Optional
+
+import numpy as np
+
+from clustering.DBScan.dbscan_cluster_builder import DBScanClusterBuilder
+from clustering.KMeans.kmeans_cluster_builder import KMeansClusterBuilder
+from clustering.SimDim.simdim_cluster_builder import SimDimClusterBuilder
+from clustering.abstract_cluster_builder import AbstractClusterBuilder
+from util.embedding_storage import prepare_embeddings
+from util.model_io import load_model
+from util.process_worker import initialize_worker, call_worker
+from util.shared_matrix import SharedMatrix, share_matrix
+from util.utils import measure
+from writers.abstract_cluster_writer import AbstractClusterWriter
+
+PIPELINE_ALGORITHMS = ["kmeans", "dbscan", "simdim"]
+
+
+class PipelineRun(NamedTuple):
+    algorithm: str
+    parameter: Optional[float] = None
+    metric: str = "euclidean"
+
+    def label(self) -> str:
+        if self.algorithm == "kmeans":
+            return f"kmeans-k{int(self.parameter)}"
+        if self.algorithm == "dbscan":
+            return f"dbscan-{self.metric}-eps{self.parameter}"
+        return self.algorithm
+
+
+class PipelineResult(NamedTuple):
+    label: str
+    clusters: int
+    seconds: float
+
+
+class PipelineWorker:
+    """Builds and writes one run of the pipeline on the embeddings shared by all runs."""
+
+    def __init__(self, input_model_path: Path, matrix: SharedMatrix, entities: Sequence[str],
+                 parallel_executions: int, writer: AbstractClusterWriter, output_directory: Path):
+        self._input_model_path: Path = input_model_path
+        self._matrix: SharedMatrix = matrix
+        self._entities: Sequence[str] = entities
+        self._parallel_executions: int = parallel_executions
+        self._writer: AbstractClusterWriter = writer
+        self._output_directory: Path = output_directory
+
+    def __call__(self, run: PipelineRun) -> PipelineResult:
+        start_time: float = time.perf_counter()
+
+        cluster_builder: AbstractClusterBuilder = self._create_builder(run)
+        cluster_builder.use_shared_matrix(self._matrix, self._entities)
+        cluster_builder.build_clusters()
+
+        # several runs of one algorithm share the builder name, so every run writes into a directory of its own
+        output_directory: Path = Path(self._output_directory.absolute(), run.label())
+        output_directory.mkdir(exist_ok=True)
+        self._writer.write(cluster_builder, output_directory)
+
+        seconds: float = time.perf_counter() - start_time
+        logging.info(f"[{run.label()}] {len(cluster_builder.clusters())} clusters in {seconds} seconds")
+        return PipelineResult(run.label(), len(cluster_builder.clusters()), seconds)
+
+    def _create_builder(self, run: PipelineRun) -> AbstractClusterBuilder:
+        if run.algorithm == "kmeans":
+            return KMeansClusterBuilder(self._input_model_path, self._parallel_executions, int(run.parameter))
+        if run.algorithm == "dbscan":
+            return DBScanClusterBuilder(self._input_model_path, self._parallel_executions, run.parameter, run.metric)
+        if run.algorithm == "simdim":
+            return SimDimClusterBuilder(self._input_model_path, self._parallel_executions, "numpy")
+
+        raise Exception(f"Invalid pipeline algorithm '{run.algorithm}'. Choose from {', '.join(PIPELINE_ALGORITHMS)}")
+
+
+class ClusterPipeline:
+    """Runs several cluster builders concurrently on a single load of the model."""
+
+    def __init__(self, input_model_path: Path, parallel_executions: int, runs: List[PipelineRun],
+                 writer: AbstractClusterWriter, dtype: Optional[str] = None, normalize: bool = False):
+        self._input_model_path: Path = input_model_path
+        self._parallel_executions: int = parallel_executions
+        self._runs: List[PipelineRun] = runs
+        self._writer: AbstractClusterWriter = writer
+        self._results: List[PipelineResult] = []
+        self._dtype: Optional[str] = dtype
+        self._normalize: bool = normalize
+
+    def run(self, output_directory: Path) -> List[PipelineResult]:
+        model = measure(lambda: load_model(self._input_model_path), "loading model")
+        concurrent_runs: int = max(1, min(self._parallel_executions, len(self._runs)))
+
+        embeddings: np.ndarray = prepare_embeddings(model.vectors, self._dtype, self._normalize)
+
+        with share_matrix(embeddings) as matrix:
+            entities: Sequence[str] = model.index2word
+            del model, embeddings
+
+            # the runs split the thread budget, each of them may start processes of its own (e.g. SimDim),
+            # which rules out the daemonic workers of multiprocessing.Pool
+            worker: PipelineWorker = PipelineWorker(self._input_model_path, matrix, entities,
+                                                    max(1, self._parallel_executions // concurrent_runs),
+                                                    self._writer, output_directory)
+            with ProcessPoolExecutor(max_workers=concurrent_runs, initializer=initialize_worker,
+                                     initargs=(worker,)) as executor:
+                self._results = measure(lambda: list(executor.map(call_worker, self._runs)), "running pipeline")
+
+        return self._results
+
+    def write(self, output_directory: Path) -> Path:
+        output_path: Path = Path(output_directory.absolute(), f"{self.name()}.csv")
+
+        with open(output_path, "w+") as output:
+            print("run,clusters,seconds", file=output)
+            for result in self._results:
+                print(f"{result.label},{result.clusters},{result.seconds}", file=output)
+
+        return output_path
+
+    def name(self) -> str:
+        return f"pipeline"
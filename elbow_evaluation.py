@@ -1,6 +1,11 @@
-import os
+import logging
+from pathlib import Path
 
-for x in range(10, 100, 10):
-    print(f"Start clustering for k={x}")
-    os.system(f"python3 main.py --input=/san2/data/teaching/chiki/wiki_living_people_model/doc2vec.binary.model --output=/san2/data/teaching/chiki/clustering_results --k={x}")
+from clustering.KMeans.kmeans_sweep import KMeansSweep
 
+logging.basicConfig(format="%(asctime)s : [%(threadName)s] %(levelname)s : %(message)s", level=logging.INFO)
+
+sweep = KMeansSweep(Path("/san2/data/teaching/chiki/wiki_living_people_model/doc2vec.binary.model"),
+                    32, list(range(10, 100, 10)))
+sweep.run()
+sweep.write(Path("/san2/data/teaching/chiki/clustering_results"))
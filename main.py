@@ -1,18 +1,31 @@
 import argparse
 import logging
 from pathlib import Path
-from typing import Optional, Any
+from typing import Optional, Any, List
 
-from clustering.DBScan.dbscan_cluster_builder import DBScanClusterBuilder
+from clustering.DBScan.dbscan_cluster_builder import DBScanClusterBuilder, VALID_DBSCAN_METRICS, VALID_DBSCAN_ENGINES
+from clustering.DBScan.eps_estimator import EpsEstimator
+from clustering.KMeans.hkmeans_cluster_builder import HKMeansClusterBuilder
 from clustering.KMeans.kmeans_cluster_builder import KMeansClusterBuilder
-from clustering.SimDim.simdim_cluster_builder import SimDimClusterBuilder
+from clustering.KMeans.kmeans_sweep import KMeansSweep
+from clustering.SimDim.simdim_cluster_builder import SimDimClusterBuilder, SIMDIM_ENGINES
 from clustering.abstract_cluster_builder import AbstractClusterBuilder
+from clustering.cluster_state import restore_cluster_builder, load_state
+from clustering.pipeline import ClusterPipeline, PipelineRun
 from util.filesystem_validators import WriteableDirectory, ReadableFile
+from util import profiling
+from util.dimensionality_reduction import DimensionalityReduction, REDUCTION_METHODS
+from util.embedding_storage import EMBEDDING_DTYPES
+from util.model_io import convert_model, FAST_MODEL_FORMATS
+from util.utils import measure
 from writers.abstract_cluster_writer import AbstractClusterWriter
+from writers.background_cluster_writer import BackgroundClusterWriter
 from writers.csv_cluster_writer import CSVClusterWriter
+from writers.npz_cluster_writer import NpzClusterWriter
+from writers.parquet_cluster_writer import ParquetClusterWriter
 from writers.text_cluster_writer import TextClusterWriter
 
-VALID_OUTPUT_MODES = ["csv", "text"]
+VALID_OUTPUT_MODES = ["csv", "text", "parquet", "npz"]
 
 
 def main() -> None:
@@ -24,29 +37,102 @@ def main() -> None:
         parser.print_usage()
         return
 
+    if args.action == "convert":
+        convert_model(args.input, args.output, args.format)
+        return
+
+    if args.action == "sweep":
+        sweep: KMeansSweep = KMeansSweep(args.input, args.threads, args.k, args.sample_size, args.checkpoint,
+                                          args.resume)
+        sweep.run()
+        sweep.write(args.output)
+        return
+
+    if args.action == "estimate-eps":
+        estimator: EpsEstimator = EpsEstimator(args.input, args.threads, args.sample_size, args.metric)
+        estimator.run()
+        estimator.write(args.output)
+        return
+
+    if args.action == "pipeline":
+        runs: List[PipelineRun] = [PipelineRun("kmeans", k) for k in args.kmeans] + \
+                                  [PipelineRun("dbscan", eps, args.metric) for eps in args.dbscan] + \
+                                  ([PipelineRun("simdim")] if args.simdim else [])
+        if not runs:
+            parser.error("pipeline requires at least one of --kmeans, --dbscan or --simdim")
+
+        pipeline: ClusterPipeline = ClusterPipeline(args.input, args.threads, runs, _create_writer(args),
+                                                    args.dtype, args.normalize)
+        pipeline.run(args.output)
+        pipeline.write(args.output)
+        return
+
     cluster_builder: Optional[AbstractClusterBuilder] = None
 
     if args.action == "kmeans":
-        cluster_builder = KMeansClusterBuilder(args.input, args.threads, args.k)
+        cluster_builder = KMeansClusterBuilder(args.input, args.threads, args.k,
+                                               args.batch_size if args.mini_batch else None, args.with_distances,
+                                               load_state(args.warm_start) if args.warm_start else None)
+
+    if args.action == "hkmeans":
+        cluster_builder = HKMeansClusterBuilder(args.input, args.threads, args.k, args.with_distances)
 
     if args.action == "dbscan":
-        cluster_builder = DBScanClusterBuilder(args.input, args.threads, args.eps)
+        cluster_builder = DBScanClusterBuilder(args.input, args.threads, args.eps, args.metric, args.engine)
 
     if args.action == "simdim":
-        cluster_builder = SimDimClusterBuilder(args.input, args.threads)
+        cluster_builder = SimDimClusterBuilder(args.input, args.threads, args.engine, args.shared_memory,
+                                               args.sort_cache, args.stream_columns, args.checkpoint, args.resume)
+
+    if args.action == "assign":
+        cluster_builder = restore_cluster_builder(args.state, args.input, args.threads, args.with_distances)
 
     if not cluster_builder:
         exit(1)
 
-    cluster_builder.build_clusters()
-    _create_writer(args).write(cluster_builder, args.output if "output" in args else None)
+    cluster_builder.store_embeddings(args.dtype, args.normalize)
+
+    if "reduce_dim" in args and args.reduce_dim:
+        cluster_builder.reduce_dimensions(DimensionalityReduction(args.reduction, args.reduce_dim),
+                                          args.reduction_cache)
+
+    if args.profile:
+        profiling.enable_profiling(args.cprofile)
+
+    pipelined: bool = "pipelined" in args and args.pipelined
+    writer: AbstractClusterWriter = _create_writer(args, args.threads if pipelined else 1)
+    sink: Optional[Path] = args.output if "output" in args else None
+
+    if pipelined and isinstance(cluster_builder, SimDimClusterBuilder):
+        # clusters are written on a background thread as soon as the worker of their dimension is done
+        with BackgroundClusterWriter(writer, cluster_builder, sink) as cluster_stream:
+            cluster_builder.stream_clusters(cluster_stream)
+            cluster_builder.build_clusters()
+    else:
+        cluster_builder.build_clusters()
+
+    if "save_state" in args and args.save_state:
+        cluster_builder.save_state(args.output)
+
+    if not (pipelined and isinstance(cluster_builder, SimDimClusterBuilder)):
+        measure(lambda: writer.write(cluster_builder, sink), "writing clusters")
 
+    if isinstance(cluster_builder, HKMeansClusterBuilder):
+        cluster_builder.write_hierarchy(args.output)
 
-def _create_writer(args) -> AbstractClusterWriter:
+    if args.profile:
+        profiling.active_profiler().write(args.output, cluster_builder.name())
+
+
+def _create_writer(args, parallel_executions: int = 1) -> AbstractClusterWriter:
     if args.output_mode == "text":
-        return TextClusterWriter()
+        return TextClusterWriter(parallel_executions)
     if args.output_mode == "csv":
-        return CSVClusterWriter()
+        return CSVClusterWriter(parallel_executions)
+    if args.output_mode == "parquet":
+        return ParquetClusterWriter(parallel_executions)
+    if args.output_mode == "npz":
+        return NpzClusterWriter(parallel_executions)
 
     raise Exception(f"Invalid output type arguments supplied. Choose from {', '.join(VALID_OUTPUT_MODES)}")
 
@@ -56,8 +142,14 @@ def _initialize_parser() -> argparse.ArgumentParser:
     subparsers = general_parser.add_subparsers()
 
     _initialize_kmeans_parser(subparsers)
+    _initialize_hkmeans_parser(subparsers)
     _initialize_dbscan_parser(subparsers)
     _initialize_simdim_parser(subparsers)
+    _initialize_assign_parser(subparsers)
+    _initialize_sweep_parser(subparsers)
+    _initialize_estimate_eps_parser(subparsers)
+    _initialize_pipeline_parser(subparsers)
+    _initialize_convert_parser(subparsers)
 
     return general_parser
 
@@ -88,6 +180,65 @@ def _initialize_kmeans_parser(subparsers) -> None:
                                help="Number of threads to use",
                                type=int,
                                default=8)
+    _add_profiling_arguments(kmeans_parser)
+    _add_storage_arguments(kmeans_parser)
+    _add_pipelined_argument(kmeans_parser)
+    _add_reduction_arguments(kmeans_parser)
+    _add_save_state_argument(kmeans_parser)
+    kmeans_parser.add_argument("--with-distances",
+                               help="Add the distance to the cluster centroid to parquet and npz output",
+                               action="store_true")
+    kmeans_parser.add_argument("--mini-batch",
+                               help="Stream the vectors through mini-batch k-means instead of fitting all at once. "
+                                    "Combine with a kv or npy model to keep memory bound by the batch size",
+                               action="store_true")
+    kmeans_parser.add_argument("--batch-size",
+                               help="Number of vectors per mini-batch",
+                               type=int,
+                               default=10000)
+    kmeans_parser.add_argument("--warm-start",
+                               help="Cluster state of a previous run with the same k and --save-state. Its clusters "
+                                    "seed a shorter fit, keep their ids and the label churn is reported",
+                               type=Path,
+                               action=ReadableFile)
+
+
+def _initialize_hkmeans_parser(subparsers) -> None:
+    hkmeans_parser = subparsers.add_parser("hkmeans",
+                                           help="Use two-level k-means for clustering with large k: about sqrt(k) "
+                                                "coarse groups, split into fine clusters in parallel")
+    hkmeans_parser.set_defaults(action="hkmeans")
+
+    hkmeans_parser.add_argument("--input",
+                                help="gensim model containing embedded entities",
+                                type=Path,
+                                action=ReadableFile,
+                                required=True)
+    hkmeans_parser.add_argument("--k",
+                                help="number of fine clusters to build",
+                                required=True,
+                                type=int)
+    hkmeans_parser.add_argument("--output",
+                                help="Desired location for storing cluster information and the hierarchy of "
+                                     "the clusters in <name>.hierarchy.csv",
+                                type=Path,
+                                action=WriteableDirectory,
+                                required=True)
+    hkmeans_parser.add_argument("--output-mode",
+                                help=f"Define the type of output. Choose from: {', '.join(VALID_OUTPUT_MODES)}",
+                                required=True)
+    hkmeans_parser.add_argument("--threads",
+                                help="Number of worker processes clustering the coarse groups",
+                                type=int,
+                                default=8)
+    _add_profiling_arguments(hkmeans_parser)
+    _add_storage_arguments(hkmeans_parser)
+    _add_pipelined_argument(hkmeans_parser)
+    _add_reduction_arguments(hkmeans_parser)
+    _add_save_state_argument(hkmeans_parser)
+    hkmeans_parser.add_argument("--with-distances",
+                                help="Add the distance to the cluster centroid to parquet and npz output",
+                                action="store_true")
 
 
 def _initialize_dbscan_parser(subparsers) -> None:
@@ -116,6 +267,20 @@ def _initialize_dbscan_parser(subparsers) -> None:
                                help="Number of threads to use",
                                type=int,
                                default=8)
+    _add_profiling_arguments(dbscan_parser)
+    _add_storage_arguments(dbscan_parser)
+    _add_pipelined_argument(dbscan_parser)
+    _add_reduction_arguments(dbscan_parser)
+    _add_save_state_argument(dbscan_parser)
+    dbscan_parser.add_argument("--metric",
+                               help=f"Distance metric. Choose from: {', '.join(VALID_DBSCAN_METRICS)}",
+                               choices=VALID_DBSCAN_METRICS,
+                               default="euclidean")
+    dbscan_parser.add_argument("--engine",
+                               help="'sklearn' runs DBSCAN directly on the vectors, 'graph' builds a sparse "
+                                    "neighbourhood graph in chunks first and clusters the precomputed graph",
+                               choices=VALID_DBSCAN_ENGINES,
+                               default="sklearn")
 
 
 def _initialize_simdim_parser(subparsers) -> None:
@@ -140,6 +305,252 @@ def _initialize_simdim_parser(subparsers) -> None:
                                help="Number of threads to use",
                                type=int,
                                default=8)
+    _add_profiling_arguments(simdim_parser)
+    _add_storage_arguments(simdim_parser)
+    _add_pipelined_argument(simdim_parser)
+    _add_checkpoint_arguments(simdim_parser)
+    _add_reduction_arguments(simdim_parser)
+    _add_save_state_argument(simdim_parser)
+    simdim_parser.add_argument("--engine",
+                               help=f"Implementation used for searching clusters. "
+                                    f"Choose from: {', '.join(SIMDIM_ENGINES)}",
+                               choices=list(SIMDIM_ENGINES),
+                               default="python")
+    simdim_parser.add_argument("--shared-memory",
+                               help="Share the vectors with all workers through a single memory-mapped copy "
+                                    "instead of pickling the model per worker (always uses the numpy engine)",
+                               action="store_true")
+    simdim_parser.add_argument("--sort-cache",
+                               help="Directory for caching the sorted order of every dimension per model, "
+                                    "so repeated runs on the same model skip sorting (numpy engine or shared memory)",
+                               type=Path,
+                               action=WriteableDirectory)
+    simdim_parser.add_argument("--stream-columns",
+                               help="Directory on disk for a column-major copy of the vectors, from which every "
+                                    "worker streams only its own dimension. Combine with a kv or npy model "
+                                    "to cluster models larger than the available memory",
+                               type=Path,
+                               action=WriteableDirectory)
+
+
+def _initialize_assign_parser(subparsers) -> None:
+    assign_parser = subparsers.add_parser("assign",
+                                          help="Assign entities to clusters stored with --save-state")
+    assign_parser.set_defaults(action="assign")
+
+    assign_parser.add_argument("--state",
+                               help="Cluster state written by a previous run with --save-state",
+                               type=Path,
+                               action=ReadableFile,
+                               required=True)
+    assign_parser.add_argument("--input",
+                               help="gensim model containing the entities to assign",
+                               type=Path,
+                               action=ReadableFile,
+                               required=True)
+    assign_parser.add_argument("--output",
+                               help="Desired location for storing cluster information",
+                               type=Path,
+                               action=WriteableDirectory,
+                               required=True)
+    assign_parser.add_argument("--output-mode",
+                               help=f"Define the type of output. Choose from: {', '.join(VALID_OUTPUT_MODES)}",
+                               required=True)
+    assign_parser.add_argument("--with-distances",
+                               help="Add the distance to the cluster centroid to parquet and npz output",
+                               action="store_true")
+    assign_parser.add_argument("--threads",
+                               help="Number of threads to use",
+                               type=int,
+                               default=8)
+    _add_profiling_arguments(assign_parser)
+    _add_storage_arguments(assign_parser)
+
+
+def _initialize_sweep_parser(subparsers) -> None:
+    sweep_parser = subparsers.add_parser("sweep",
+                                         help="Evaluate k-means for several k on a single model load")
+    sweep_parser.set_defaults(action="sweep")
+
+    sweep_parser.add_argument("--input",
+                              help="gensim model containing embedded entities",
+                              type=Path,
+                              action=ReadableFile,
+                              required=True)
+    sweep_parser.add_argument("--k",
+                              help="numbers of clusters to evaluate",
+                              nargs="+",
+                              type=int,
+                              default=list(range(10, 100, 10)))
+    sweep_parser.add_argument("--output",
+                              help="Desired location for storing the sweep results",
+                              type=Path,
+                              action=WriteableDirectory,
+                              required=True)
+    sweep_parser.add_argument("--sample-size",
+                              help="Number of vectors sampled for computing the silhouette score",
+                              type=int,
+                              default=10000)
+    sweep_parser.add_argument("--threads",
+                              help="Number of threads to use",
+                              type=int,
+                              default=8)
+    _add_checkpoint_arguments(sweep_parser)
+
+
+def _initialize_estimate_eps_parser(subparsers) -> None:
+    estimate_eps_parser = subparsers.add_parser("estimate-eps",
+                                                help="Suggest DBSCAN radii and preview their clusters on a sample")
+    estimate_eps_parser.set_defaults(action="estimate-eps")
+
+    estimate_eps_parser.add_argument("--input",
+                                     help="gensim model containing embedded entities",
+                                     type=Path,
+                                     action=ReadableFile,
+                                     required=True)
+    estimate_eps_parser.add_argument("--output",
+                                     help="Desired location for storing the suggestions and the k-distance curve",
+                                     type=Path,
+                                     action=WriteableDirectory,
+                                     required=True)
+    estimate_eps_parser.add_argument("--sample-size",
+                                     help="Number of vectors sampled for estimating the radius",
+                                     type=int,
+                                     default=10000)
+    estimate_eps_parser.add_argument("--metric",
+                                     help=f"Distance metric. Choose from: {', '.join(VALID_DBSCAN_METRICS)}",
+                                     choices=VALID_DBSCAN_METRICS,
+                                     default="euclidean")
+    estimate_eps_parser.add_argument("--threads",
+                                     help="Number of threads to use",
+                                     type=int,
+                                     default=8)
+
+
+def _initialize_pipeline_parser(subparsers) -> None:
+    pipeline_parser = subparsers.add_parser("pipeline",
+                                            help="Run several algorithms concurrently on a single model load")
+    pipeline_parser.set_defaults(action="pipeline")
+
+    pipeline_parser.add_argument("--input",
+                                 help="gensim model containing embedded entities",
+                                 type=Path,
+                                 action=ReadableFile,
+                                 required=True)
+    pipeline_parser.add_argument("--output",
+                                 help="Desired location for the output of all runs, each run writes into "
+                                      "a directory of its own",
+                                 type=Path,
+                                 action=WriteableDirectory,
+                                 required=True)
+    pipeline_parser.add_argument("--output-mode",
+                                 help=f"Define the type of output. Choose from: {', '.join(VALID_OUTPUT_MODES)}",
+                                 required=True)
+    pipeline_parser.add_argument("--kmeans",
+                                 help="Numbers of clusters, one k-means run per value",
+                                 nargs="+",
+                                 type=int,
+                                 default=[])
+    pipeline_parser.add_argument("--dbscan",
+                                 help="Radii, one DBSCAN run per value",
+                                 nargs="+",
+                                 type=float,
+                                 default=[])
+    pipeline_parser.add_argument("--metric",
+                                 help=f"Distance metric of the DBSCAN runs. "
+                                      f"Choose from: {', '.join(VALID_DBSCAN_METRICS)}",
+                                 choices=VALID_DBSCAN_METRICS,
+                                 default="euclidean")
+    pipeline_parser.add_argument("--simdim",
+                                 help="Add a SimDim run",
+                                 action="store_true")
+    pipeline_parser.add_argument("--threads",
+                                 help="Number of threads shared by all runs",
+                                 type=int,
+                                 default=8)
+    _add_storage_arguments(pipeline_parser)
+
+
+def _initialize_convert_parser(subparsers) -> None:
+    convert_parser = subparsers.add_parser("convert",
+                                           help="Convert a model into a format which loads faster")
+    convert_parser.set_defaults(action="convert")
+
+    convert_parser.add_argument("--input",
+                                help="gensim model containing embedded entities",
+                                type=Path,
+                                action=ReadableFile,
+                                required=True)
+    convert_parser.add_argument("--output",
+                                help="Desired location for storing the converted model",
+                                type=Path,
+                                action=WriteableDirectory,
+                                required=True)
+    convert_parser.add_argument("--format",
+                                help=f"Format to convert into. Choose from: {', '.join(FAST_MODEL_FORMATS)}",
+                                choices=FAST_MODEL_FORMATS,
+                                default="kv")
+
+
+def _add_profiling_arguments(parser) -> None:
+    parser.add_argument("--profile",
+                        help="Write wall time, CPU time and peak memory per stage to <name>.metrics.json "
+                             "next to the output",
+                        action="store_true")
+    parser.add_argument("--cprofile",
+                        help="Additionally dump cProfile statistics to <name>.prof (requires --profile)",
+                        action="store_true")
+
+
+def _add_checkpoint_arguments(parser) -> None:
+    parser.add_argument("--checkpoint",
+                        help="Directory for storing every finished part of the run, keyed by model and parameters",
+                        type=Path,
+                        action=WriteableDirectory)
+    parser.add_argument("--resume",
+                        help="Skip the parts already stored by an interrupted run with the same --checkpoint",
+                        action="store_true")
+
+
+def _add_save_state_argument(parser) -> None:
+    parser.add_argument("--save-state",
+                        help="Store the fitted clusters next to the output, so new entities can be assigned later",
+                        action="store_true")
+
+
+def _add_pipelined_argument(parser) -> None:
+    parser.add_argument("--pipelined",
+                        help="Overlap writing with clustering: SimDim writes every cluster as soon as it is found, "
+                             "text and csv output of other algorithms is formatted by --threads processes",
+                        action="store_true")
+
+
+def _add_storage_arguments(parser) -> None:
+    parser.add_argument("--dtype",
+                        help=f"Convert the vectors before clustering. Choose from: {', '.join(EMBEDDING_DTYPES)}. "
+                             f"float16 halves the memory of SimDim, shared matrices, the fine fits of hkmeans, "
+                             f"mini-batch k-means and assign, which convert single columns or chunks only. "
+                             f"Full k-means and the coarse fit of hkmeans need a float32 copy of all vectors and "
+                             f"DBSCAN a float64 one, so float16 saves nothing there",
+                        choices=EMBEDDING_DTYPES)
+    parser.add_argument("--normalize",
+                        help="Scale the vectors to unit length, so euclidean clustering clusters by cosine "
+                             "(a euclidean distance d equals a cosine distance of d^2 / 2)",
+                        action="store_true")
+
+
+def _add_reduction_arguments(parser) -> None:
+    parser.add_argument("--reduce-dim",
+                        help="Project the vectors onto this many dimensions before clustering",
+                        type=int)
+    parser.add_argument("--reduction",
+                        help=f"Method used by --reduce-dim. Choose from: {', '.join(REDUCTION_METHODS)}",
+                        choices=REDUCTION_METHODS,
+                        default="pca")
+    parser.add_argument("--reduction-cache",
+                        help="Directory for caching reduced vectors per model and reduction",
+                        type=Path,
+                        action=WriteableDirectory)
 
 
 if __name__ == "__main__":
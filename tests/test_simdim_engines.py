@@ -0,0 +1,58 @@
+from typing import Callable, Dict
+
+import numpy as np
+import pytest
+
+from clustering.SimDim.simdim_cluster_worker import SimDimClusterWorker
+from clustering.SimDim.simdim_numpy_cluster_worker import SimDimNumpyClusterWorker
+
+NUMBER_OF_ENTITIES = 300
+NUMBER_OF_DIMENSIONS = 8
+
+
+def _random(random: np.random.RandomState) -> np.ndarray:
+    return random.randn(NUMBER_OF_ENTITIES, NUMBER_OF_DIMENSIONS)
+
+
+def _bimodal(random: np.random.RandomState) -> np.ndarray:
+    modes: np.ndarray = random.choice([-2.0, 3.0], size=(NUMBER_OF_ENTITIES, NUMBER_OF_DIMENSIONS))
+    return modes + random.randn(NUMBER_OF_ENTITIES, NUMBER_OF_DIMENSIONS) * random.uniform(0.05, 1.0)
+
+
+def _ties(random: np.random.RandomState) -> np.ndarray:
+    return np.round(random.randn(NUMBER_OF_ENTITIES, NUMBER_OF_DIMENSIONS), decimals=1)
+
+
+def _equally_spaced(random: np.random.RandomState) -> np.ndarray:
+    # with the minimum cluster size of 10 the tolerance equals the spacing up to rounding, so window boundaries
+    # fall exactly where the two engines compare differently and the rounding correction has to agree
+    step: float = random.choice([0.1, 0.3, 1 / 3, 0.7])
+    offsets: np.ndarray = random.uniform(-5, 5, size=NUMBER_OF_DIMENSIONS)
+    return np.stack([random.permutation(NUMBER_OF_ENTITIES) * step + offset for offset in offsets], axis=1)
+
+
+COLUMN_GENERATORS: Dict[str, Callable[[np.random.RandomState], np.ndarray]] = {"random": _random,
+                                                                                "bimodal": _bimodal,
+                                                                                "ties": _ties,
+                                                                                "equally-spaced": _equally_spaced}
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("columns", COLUMN_GENERATORS)
+def test_numpy_engine_finds_the_same_clusters(columns: str, seed: int, dtype: type):
+    embeddings: np.ndarray = COLUMN_GENERATORS[columns](np.random.RandomState(seed)).astype(dtype)
+    python_worker: SimDimClusterWorker = SimDimClusterWorker(embeddings)
+    numpy_worker: SimDimNumpyClusterWorker = SimDimNumpyClusterWorker(embeddings)
+
+    for dimension in range(NUMBER_OF_DIMENSIONS):
+        expected = python_worker(dimension)
+        actual = numpy_worker(dimension)
+
+        if expected is None:
+            assert actual is None
+            continue
+
+        assert actual is not None
+        assert actual[0] == expected[0] == dimension
+        np.testing.assert_array_equal(np.sort(actual[1]), np.sort(expected[1]))
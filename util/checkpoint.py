@@ -0,0 +1,42 @@
+import os
+from pathlib import Path
+from typing import Dict, Optional, List
+
+import numpy as np
+
+CHECKPOINT_SUFFIX = ".npz"
+
+
+class CheckpointStore:
+    """Completed work items of one job, e.g. the dimensions of a SimDim run, stored as one .npz file each.
+
+    ``key`` should identify the model and every parameter influencing the results, so that resuming never
+    mixes results of different jobs.
+    """
+
+    def __init__(self, directory: Path, key: str):
+        self._directory: Path = Path(directory.absolute(), key)
+        self._directory.mkdir(parents=True, exist_ok=True)
+
+    def save(self, item: str, **arrays: np.ndarray) -> None:
+        path: Path = self._path(item)
+        temporary_path: Path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+
+        with open(temporary_path, "wb") as checkpoint_file:
+            np.savez(checkpoint_file, **arrays)
+        # a crash never leaves a partially written item behind
+        os.replace(str(temporary_path), str(path))
+
+    def load(self, item: str) -> Optional[Dict[str, np.ndarray]]:
+        path: Path = self._path(item)
+        if not path.exists():
+            return None
+
+        with np.load(str(path)) as checkpoint_file:
+            return dict(checkpoint_file)
+
+    def items(self) -> List[str]:
+        return sorted(path.name[:-len(CHECKPOINT_SUFFIX)] for path in self._directory.glob(f"*{CHECKPOINT_SUFFIX}"))
+
+    def _path(self, item: str) -> Path:
+        return Path(self._directory, f"{item}{CHECKPOINT_SUFFIX}")
@@ -0,0 +1,122 @@
+import json
+import logging
+import os
+from pathlib import Path
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+from sklearn.decomposition import PCA, IncrementalPCA
+from sklearn.random_projection import SparseRandomProjection
+
+REDUCTION_METHODS = ["pca", "incremental-pca", "random-projection"]
+REDUCTION_CHUNK_SIZE = 10000
+VARIANCE_SAMPLE_SIZE = 10000
+
+
+class DimensionalityReduction(NamedTuple):
+    method: str
+    dimensions: int
+
+    def key(self) -> str:
+        return f"{self.method}-{self.dimensions}"
+
+
+class Projection(NamedTuple):
+    """Affine map ``(vectors - mean) @ components.T`` learned by a reduction, applicable to unseen vectors."""
+    components: np.ndarray
+    mean: np.ndarray
+    explained_variance: float
+
+    def transform(self, vectors: np.ndarray, output: Optional[np.ndarray] = None) -> np.ndarray:
+        if output is None:
+            output = np.empty((len(vectors), len(self.components)), dtype=np.float32)
+
+        for start in range(0, len(vectors), REDUCTION_CHUNK_SIZE):
+            end: int = start + REDUCTION_CHUNK_SIZE
+            output[start:end] = (vectors[start:end] - self.mean) @ self.components.T
+
+        return output
+
+
+def load_or_reduce(embeddings: np.ndarray, reduction: DimensionalityReduction, cache_directory: Optional[Path],
+                   fingerprint: str) -> Tuple[np.ndarray, Projection]:
+    """Return the reduced embeddings and the projection producing them.
+
+    With a ``cache_directory`` both are stored keyed by model fingerprint and reduction, later runs memory-map
+    the reduced matrix instead of fitting again.
+    """
+    if reduction.method not in REDUCTION_METHODS:
+        raise Exception(f"Invalid reduction '{reduction.method}'. Choose from {', '.join(REDUCTION_METHODS)}")
+    if not 0 < reduction.dimensions < embeddings.shape[1]:
+        raise Exception(f"Cannot reduce {embeddings.shape[1]} dimensions to {reduction.dimensions}")
+
+    if cache_directory is None:
+        projection: Projection = _fit_projection(embeddings, reduction)
+        return projection.transform(embeddings), projection
+
+    matrix_path: Path = Path(cache_directory.absolute(), f"{fingerprint}.{reduction.key()}.npy")
+    projection_path: Path = matrix_path.with_suffix(".projection.npz")
+    variance_path: Path = matrix_path.with_suffix(".json")
+
+    if matrix_path.exists() and projection_path.exists():
+        logging.info(f"Reusing reduced embeddings '{matrix_path}'")
+        with np.load(str(projection_path)) as projection_file:
+            projection = Projection(projection_file["components"], projection_file["mean"],
+                                    float(projection_file["explained_variance"]))
+        return np.load(str(matrix_path), mmap_mode="r"), projection
+
+    projection = _fit_projection(embeddings, reduction)
+
+    temporary_path: Path = matrix_path.with_name(f"{matrix_path.name}.{os.getpid()}.tmp")
+    reduced: np.ndarray = np.lib.format.open_memmap(str(temporary_path), mode="w+", dtype=np.float32,
+                                                    shape=(len(embeddings), reduction.dimensions))
+    projection.transform(embeddings, reduced)
+    reduced.flush()
+    del reduced
+
+    np.savez(str(projection_path), components=projection.components, mean=projection.mean,
+             explained_variance=np.array(projection.explained_variance))
+    with open(variance_path, "w+") as variance_file:
+        json.dump({**reduction._asdict(), "explained_variance": projection.explained_variance}, variance_file)
+    # publish the matrix last, its presence marks a complete cache entry
+    os.replace(str(temporary_path), str(matrix_path))
+
+    logging.info(f"Cached reduced embeddings in '{matrix_path}'")
+    return np.load(str(matrix_path), mmap_mode="r"), projection
+
+
+def _fit_projection(embeddings: np.ndarray, reduction: DimensionalityReduction) -> Projection:
+    if reduction.method == "pca":
+        pca: PCA = PCA(n_components=reduction.dimensions, svd_solver="randomized", random_state=0)
+        pca.fit(embeddings)
+        components, mean = pca.components_, pca.mean_
+    elif reduction.method == "incremental-pca":
+        # fits chunk by chunk, a memory-mapped model never has to be resident at once
+        incremental_pca: IncrementalPCA = IncrementalPCA(n_components=reduction.dimensions)
+        batch_size: int = max(REDUCTION_CHUNK_SIZE, reduction.dimensions)
+        for start in range(0, len(embeddings), batch_size):
+            chunk: np.ndarray = embeddings[start:start + batch_size]
+            if len(chunk) >= reduction.dimensions:
+                incremental_pca.partial_fit(chunk)
+        components, mean = incremental_pca.components_, incremental_pca.mean_
+    else:
+        random_projection: SparseRandomProjection = SparseRandomProjection(n_components=reduction.dimensions,
+                                                                           random_state=0)
+        random_projection.fit(embeddings[:1])
+        components, mean = random_projection.components_.toarray(), np.zeros(embeddings.shape[1])
+
+    components = components.astype(np.float32)
+    mean = mean.astype(np.float32)
+    return Projection(components, mean, _explained_variance(embeddings, components, mean))
+
+
+def _explained_variance(embeddings: np.ndarray, components: np.ndarray, mean: np.ndarray) -> float:
+    """Share of the variance of a sample lying in the subspace spanned by ``components``."""
+    sample: np.ndarray = np.random.RandomState(0).choice(len(embeddings), min(len(embeddings), VARIANCE_SAMPLE_SIZE),
+                                                         replace=False)
+    centered: np.ndarray = embeddings[np.sort(sample)] - mean
+    centered = centered - centered.mean(axis=0)
+
+    basis, _ = np.linalg.qr(components.T.astype(np.float64))
+    total_variance: float = float(np.square(centered).sum())
+    return float(np.square(centered @ basis).sum()) / total_variance if total_variance else 1.0
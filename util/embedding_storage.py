@@ -0,0 +1,50 @@
+import logging
+from typing import Optional
+
+import numpy as np
+
+EMBEDDING_DTYPES = ["float32", "float16"]
+NORMALIZATION_CHUNK_SIZE = 65536
+
+
+def prepare_embeddings(embeddings: np.ndarray, dtype: Optional[str] = None, normalize: bool = False) -> np.ndarray:
+    """Convert ``embeddings`` to ``dtype`` and scale them to unit length, copying only where necessary.
+
+    Unit vectors turn cosine into euclidean clustering: their squared euclidean distance is twice their
+    cosine distance.
+    """
+    if dtype is not None and dtype not in EMBEDDING_DTYPES:
+        raise Exception(f"Invalid embedding dtype '{dtype}'. Choose from {', '.join(EMBEDDING_DTYPES)}")
+
+    if dtype is not None and embeddings.dtype != np.dtype(dtype):
+        embeddings = embeddings.astype(dtype)
+    if normalize:
+        if not embeddings.flags.writeable:
+            # memory-mapped models are opened read-only, normalize a private copy instead
+            embeddings = np.array(embeddings)
+        normalize_rows(embeddings)
+
+    return embeddings
+
+
+def estimator_input(embeddings: np.ndarray) -> np.ndarray:
+    """``embeddings`` in a dtype sklearn fits without converting them, for estimators fitted on all vectors at once.
+
+    sklearn's k-means accepts float32 and float64 only and turns float16 into a float64 copy of four times the
+    size, a float32 copy is the cheapest input left.
+    """
+    if embeddings.dtype != np.float16:
+        return embeddings
+
+    logging.warning("k-means cannot fit float16 vectors, fitting a float32 copy instead")
+    return embeddings.astype(np.float32)
+
+
+def normalize_rows(embeddings: np.ndarray) -> None:
+    """L2-normalize every row of ``embeddings`` in place, zero vectors stay zero."""
+    for start in range(0, len(embeddings), NORMALIZATION_CHUNK_SIZE):
+        chunk: np.ndarray = embeddings[start:start + NORMALIZATION_CHUNK_SIZE]
+        # accumulate in float32 at least, float16 squares overflow for moderately large components
+        norms: np.ndarray = np.linalg.norm(chunk.astype(np.promote_types(chunk.dtype, np.float32)), axis=1)
+        norms[norms == 0] = 1
+        chunk /= norms[:, np.newaxis].astype(chunk.dtype)
@@ -0,0 +1,139 @@
+import hashlib
+import logging
+from pathlib import Path
+from typing import List, Sequence
+
+import numpy as np
+from gensim import utils
+from gensim.models import KeyedVectors
+from gensim.models.keyedvectors import Vocab
+
+MODEL_FORMATS = ["text", "binary", "kv", "npy"]
+FAST_MODEL_FORMATS = ["kv", "npy", "binary"]
+VOCAB_SIDECAR_SUFFIX = ".vocab"
+BINARY_SNIFF_SIZE = 4096
+FINGERPRINT_CHUNK_SIZE = 1 << 20
+
+
+def detect_model_format(model_path: Path) -> str:
+    if model_path.suffix == ".kv":
+        return "kv"
+    if model_path.suffix == ".npy":
+        return "npy"
+    if _is_binary_word2vec(model_path):
+        return "binary"
+    return "text"
+
+
+def load_model(model_path: Path) -> KeyedVectors:
+    model_format: str = detect_model_format(model_path)
+    logging.info(f"Loading '{model_path.absolute()}' as {model_format} model")
+
+    if model_format == "kv":
+        return KeyedVectors.load(str(model_path.absolute()), mmap="r")
+    if model_format == "npy":
+        return _load_numpy_model(model_path)
+
+    return KeyedVectors.load_word2vec_format(str(model_path.absolute()), binary=model_format == "binary")
+
+
+def save_model(model: KeyedVectors, output_directory: Path, name: str, model_format: str) -> Path:
+    if model_format in ["kv", "binary"]:
+        _ensure_vocab(model)
+
+    if model_format == "kv":
+        model_path: Path = Path(output_directory.absolute(), f"{name}.kv")
+        # store the vectors in a separate .npy file so that they can be memory-mapped on load
+        model.save(str(model_path), sep_limit=0)
+    elif model_format == "npy":
+        model_path = Path(output_directory.absolute(), f"{name}.npy")
+        np.save(str(model_path), model.vectors)
+        _write_vocab_sidecar(model.index2word, model_path.with_suffix(VOCAB_SIDECAR_SUFFIX))
+    elif model_format == "binary":
+        model_path = Path(output_directory.absolute(), f"{name}.bin")
+        model.save_word2vec_format(str(model_path), binary=True)
+    else:
+        raise Exception(f"Invalid model format '{model_format}'. Choose from {', '.join(FAST_MODEL_FORMATS)}")
+
+    logging.info(f"Saved {model_format} model to '{model_path}'")
+    return model_path
+
+
+def convert_model(input_model_path: Path, output_directory: Path, model_format: str) -> Path:
+    return save_model(load_model(input_model_path), output_directory, input_model_path.stem, model_format)
+
+
+def model_fingerprint(model_path: Path) -> str:
+    """Hash of the model content including companion files, changes whenever the model changes."""
+    digest = hashlib.sha1()
+    companion_paths: List[Path] = [Path(f"{model_path.absolute()}.vectors.npy"),
+                                   model_path.with_suffix(VOCAB_SIDECAR_SUFFIX)]
+
+    for path in [model_path] + [path for path in companion_paths if path.exists() and path != model_path]:
+        with open(path, "rb") as model_file:
+            for chunk in iter(lambda: model_file.read(FINGERPRINT_CHUNK_SIZE), b""):
+                digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def _load_numpy_model(model_path: Path) -> KeyedVectors:
+    vectors: np.ndarray = np.load(str(model_path.absolute()), mmap_mode="r")
+    entities: List[str] = _read_vocab_sidecar(model_path.with_suffix(VOCAB_SIDECAR_SUFFIX))
+
+    if len(entities) != len(vectors):
+        raise Exception(f"'{model_path.absolute()}' contains {len(vectors)} vectors "
+                        f"but its vocab sidecar lists {len(entities)} entities")
+
+    model: KeyedVectors = KeyedVectors(vectors.shape[1])
+    model.vectors = vectors
+    model.index2word = entities
+    # clustering needs vectors and index2word only, the vocab is built once a conversion needs it
+    return model
+
+
+def _ensure_vocab(model: KeyedVectors) -> None:
+    """Build the vocab of models loaded from npy, which gensim needs for writing kv and binary models."""
+    if not model.vocab:
+        model.vocab = {entity: Vocab(index=index, count=len(model.index2word) - index)
+                       for index, entity in enumerate(model.index2word)}
+
+
+def pack_entities(entities: Sequence[str]) -> np.ndarray:
+    """``entities`` as utf-8 bytes, one per line like in a vocab sidecar, for storing them in .npz files.
+
+    Unlike a string array, the bytes take no padding to the longest entity and are built without a Python loop.
+    """
+    text: str = "\n".join(entities) + "\n" if len(entities) else ""
+    return np.frombuffer(text.encode("utf-8"), dtype=np.uint8)
+
+
+def unpack_entities(packed: np.ndarray) -> List[str]:
+    return packed.tobytes().decode("utf-8").split("\n")[:-1]
+
+
+def _read_vocab_sidecar(vocab_path: Path) -> List[str]:
+    if not vocab_path.exists():
+        raise Exception(f"Missing vocab sidecar '{vocab_path.absolute()}'")
+
+    with open(vocab_path, "r", encoding="utf-8") as vocab_file:
+        return [line.rstrip("\n") for line in vocab_file]
+
+
+def _write_vocab_sidecar(entities: List[str], vocab_path: Path) -> None:
+    with open(vocab_path, "w+", encoding="utf-8") as vocab_file:
+        vocab_file.writelines(f"{entity}\n" for entity in entities)
+
+
+def _is_binary_word2vec(model_path: Path) -> bool:
+    with utils.smart_open(str(model_path.absolute()), "rb") as model_file:
+        model_file.readline()  # the header is plain text in both word2vec formats
+        sample: bytes = model_file.read(BINARY_SNIFF_SIZE)
+
+    try:
+        # drop the tail, it may end inside a multi-byte character
+        sample[:-4].decode("utf-8")
+    except UnicodeDecodeError:
+        return True
+
+    return any(byte < 0x20 and byte not in b"\t\n\r" for byte in sample)
@@ -0,0 +1,17 @@
+from typing import Any, Callable, Optional
+
+_worker: Optional[Callable[[Any], Any]] = None
+
+
+def initialize_worker(worker: Callable[[Any], Any]) -> None:
+    """Pool initializer handing ``worker`` to a process once, so that tasks carry nothing but their argument.
+
+    Workers often hold large state, e.g. a whole matrix or all entities, which would otherwise be pickled
+    with every task.
+    """
+    global _worker
+    _worker = worker
+
+
+def call_worker(argument: Any) -> Any:
+    return _worker(argument)
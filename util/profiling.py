@@ -0,0 +1,115 @@
+import cProfile
+import json
+import logging
+import resource
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import NamedTuple, Optional, Dict, List, Any, Callable, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# ru_maxrss is reported in kilobytes on Linux but in bytes on macOS
+RSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+
+class ResourceUsage(NamedTuple):
+    wall_seconds: float
+    cpu_seconds: float
+    children_cpu_seconds: float
+    peak_rss_bytes: int
+    children_peak_rss_bytes: int
+
+    @staticmethod
+    def now() -> "ResourceUsage":
+        own: Any = resource.getrusage(resource.RUSAGE_SELF)
+        children: Any = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return ResourceUsage(time.perf_counter(),
+                             own.ru_utime + own.ru_stime,
+                             children.ru_utime + children.ru_stime,
+                             own.ru_maxrss * RSS_UNIT,
+                             children.ru_maxrss * RSS_UNIT)
+
+
+class Profiler:
+    """Collects per-stage resource usage and arbitrary records, written as one JSON metrics file."""
+
+    def __init__(self, with_cprofile: bool = False):
+        self._start: ResourceUsage = ResourceUsage.now()
+        self._stages: List[Dict[str, Any]] = []
+        self._records: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._cprofile: Optional[cProfile.Profile] = cProfile.Profile() if with_cprofile else None
+
+        if self._cprofile:
+            self._cprofile.enable()
+
+    def add_stage(self, stage: str, start: ResourceUsage, end: ResourceUsage) -> None:
+        self._stages.append({"stage": stage, **self._difference(start, end)})
+
+    def add_record(self, category: str, values: Dict[str, Any]) -> None:
+        self._records[category].append(values)
+
+    def write(self, output_directory: Path, name: str) -> Path:
+        metrics_path: Path = Path(output_directory.absolute(), f"{name}.metrics.json")
+
+        if self._cprofile:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(str(Path(output_directory.absolute(), f"{name}.prof")))
+
+        with open(metrics_path, "w+") as metrics_file:
+            json.dump({"name": name,
+                       "total": self._difference(self._start, ResourceUsage.now()),
+                       "stages": self._stages,
+                       **self._records}, metrics_file, indent=2)
+
+        logging.info(f"Wrote metrics to '{metrics_path}'")
+        return metrics_path
+
+    @staticmethod
+    def _difference(start: ResourceUsage, end: ResourceUsage) -> Dict[str, Any]:
+        # peak memory is a high-water mark of the whole process, report the value reached so far
+        return {"wall_seconds": end.wall_seconds - start.wall_seconds,
+                "cpu_seconds": end.cpu_seconds - start.cpu_seconds,
+                "children_cpu_seconds": end.children_cpu_seconds - start.children_cpu_seconds,
+                "peak_rss_bytes": end.peak_rss_bytes,
+                "children_peak_rss_bytes": end.children_peak_rss_bytes}
+
+
+class TimedCall:
+    """Picklable wrapper returning ``(argument, result, wall seconds, cpu seconds)`` of a call inside pool workers.
+
+    Returning the argument as well keeps results attributable when they arrive out of order.
+    """
+
+    def __init__(self, function: Callable[[Any], T]):
+        self._function: Callable[[Any], T] = function
+
+    def __call__(self, argument: Any) -> Tuple[Any, T, float, float]:
+        start_wall: float = time.perf_counter()
+        start_cpu: float = time.process_time()
+        result: T = self._function(argument)
+        return argument, result, time.perf_counter() - start_wall, time.process_time() - start_cpu
+
+
+_profiler: Optional[Profiler] = None
+
+
+def enable_profiling(with_cprofile: bool = False) -> Profiler:
+    global _profiler
+    _profiler = Profiler(with_cprofile)
+    return _profiler
+
+
+def active_profiler() -> Optional[Profiler]:
+    return _profiler
+
+
+def record_stage(stage: str, start: ResourceUsage, end: ResourceUsage) -> None:
+    if _profiler:
+        _profiler.add_stage(stage, start, end)
+
+
+def record(category: str, **values: Any) -> None:
+    if _profiler:
+        _profiler.add_record(category, values)
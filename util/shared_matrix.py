@@ -0,0 +1,63 @@
+import logging
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import NamedTuple, Tuple, Optional, Iterator
+
+import numpy as np
+
+SHARED_MEMORY_DIRECTORY = Path("/dev/shm")
+COPY_CHUNK_SIZE = 65536
+
+
+class SharedMatrix(NamedTuple):
+    """Picklable handle to a matrix stored in a memory-mapped file.
+
+    Every process opening the handle maps the same pages, so the matrix stays
+    resident only once no matter how many workers read from it.
+    """
+    path: str
+    shape: Tuple[int, int]
+    dtype: str
+    order: str = "C"
+
+    def open(self) -> np.ndarray:
+        return np.memmap(self.path, dtype=self.dtype, mode="r", shape=self.shape, order=self.order)
+
+
+@contextmanager
+def share_matrix(matrix: np.ndarray, directory: Optional[Path] = None, order: str = "C") -> Iterator[SharedMatrix]:
+    """Copy ``matrix`` into a temporary memory-mapped file, removed again on exit.
+
+    With ``order="F"`` the file is column-major, so reading a single column is one sequential read. The copy
+    goes through chunks of rows in either case and never needs more memory than one chunk.
+    """
+    if directory is None and SHARED_MEMORY_DIRECTORY.is_dir():
+        directory = SHARED_MEMORY_DIRECTORY
+        if _free_bytes(directory) < matrix.nbytes:
+            # writing past the end of a full tmpfs kills the process with SIGBUS instead of raising an error
+            logging.warning(f"{SHARED_MEMORY_DIRECTORY} has no room for {matrix.nbytes} bytes, "
+                            f"sharing the matrix through {tempfile.gettempdir()} instead")
+            directory = None
+
+    file_descriptor, path = tempfile.mkstemp(suffix=".matrix", dir=str(directory) if directory else None)
+    os.close(file_descriptor)
+
+    try:
+        handle: SharedMatrix = SharedMatrix(path, tuple(matrix.shape), matrix.dtype.str, order)
+        shared: np.ndarray = np.memmap(path, dtype=handle.dtype, mode="w+", shape=handle.shape, order=order)
+        for start in range(0, len(matrix), COPY_CHUNK_SIZE):
+            shared[start:start + COPY_CHUNK_SIZE] = matrix[start:start + COPY_CHUNK_SIZE]
+        shared.flush()
+        # drop the references held by this frame, callers may release their copy while the handle is in use
+        del shared, matrix
+
+        yield handle
+    finally:
+        os.remove(path)
+
+
+def _free_bytes(directory: Path) -> int:
+    status: os.statvfs_result = os.statvfs(str(directory))
+    return status.f_bavail * status.f_frsize
@@ -1,14 +1,17 @@
 import logging
-import time
 from typing import Callable, Any, TypeVar
 
+from util import profiling
+from util.profiling import ResourceUsage
+
 T = TypeVar("T")
 
 
 def measure(function_to_execute: Callable[[], T], function_name) -> T:
-    start_time: float = time.perf_counter()
+    start_usage: ResourceUsage = ResourceUsage.now()
     return_value: Any = function_to_execute()
-    end_time: float = time.perf_counter()
+    end_usage: ResourceUsage = ResourceUsage.now()
 
-    logging.info(f"Execution of {function_name} took {end_time - start_time} seconds")
+    logging.info(f"Execution of {function_name} took {end_usage.wall_seconds - start_usage.wall_seconds} seconds")
+    profiling.record_stage(function_name, start_usage, end_usage)
     return return_value
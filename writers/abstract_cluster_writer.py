@@ -1,28 +1,40 @@
 import sys
 from abc import abstractmethod, ABC
 from pathlib import Path
-from typing import Optional, TextIO, Iterable
+from typing import Optional, TextIO, Iterable, Tuple, Sequence, Callable
+
+import numpy as np
 
 from clustering.abstract_cluster_builder import AbstractClusterBuilder
 
 
 class AbstractClusterWriter(ABC):
 
+    def __init__(self, parallel_executions: int = 1):
+        self._parallel_executions: int = parallel_executions
+
     def write(self, cluster_builder: AbstractClusterBuilder, sink: Optional[Path] = None) -> None:
+        self._write(cluster_builder.name(), lambda output: self._write_to_output(cluster_builder, output), sink)
+
+    def write_stream(self, name: str, clusters: Iterable[Tuple[int, np.ndarray]], entities: Sequence[str],
+                     sink: Optional[Path] = None) -> None:
+        """Write clusters, given as entity indices, while they arrive instead of once all of them are known."""
+        self._write(name, lambda output: self._write_stream_to_output(clusters, entities, output), sink)
+
+    def _write(self, name: str, write_to_output: Callable[[TextIO], None], sink: Optional[Path]) -> None:
         if sink:
-            self._write_to_file(cluster_builder, sink)
+            with open(Path(sink.absolute(), f"{name}.{self._file_extension()}"), "w+") as output:
+                write_to_output(output)
         else:
-            self._write_to_output(cluster_builder, sys.stdout)
-
-    def _write_to_file(self, cluster_builder: AbstractClusterBuilder, sink: Path) -> None:
-        with open(Path(sink.absolute(), f"{cluster_builder.name()}.{self._file_extension()}"), "w+") as output:
-            self._write_to_output(cluster_builder, output)
+            write_to_output(sys.stdout)
 
+    @abstractmethod
     def _write_to_output(self, cluster_builder: AbstractClusterBuilder, output: TextIO):
-        print(*self._generate_output(cluster_builder), sep="\n", end="\n", file=output)
+        raise NotImplementedError
 
     @abstractmethod
-    def _generate_output(self, cluster_builder: AbstractClusterBuilder) -> Iterable[str]:
+    def _write_stream_to_output(self, clusters: Iterable[Tuple[int, np.ndarray]], entities: Sequence[str],
+                                output: TextIO):
         raise NotImplementedError
 
     @abstractmethod
@@ -0,0 +1,45 @@
+from abc import abstractmethod
+from typing import Iterable, Iterator, Tuple, Sequence, Optional, BinaryIO, TextIO
+
+import numpy as np
+
+from clustering.abstract_cluster_builder import AbstractClusterBuilder
+from clustering.cluster_assignment import ClusterAssignment
+from writers.abstract_cluster_writer import AbstractClusterWriter
+
+COLUMN_CHUNK_SIZE = 1000000
+
+ColumnChunk = Tuple[Sequence[str], np.ndarray, Optional[np.ndarray]]
+
+
+class AbstractColumnarClusterWriter(AbstractClusterWriter):
+    """Writes entity, cluster id and, if the builder scored its entities, centroid distance as binary columns."""
+
+    def _write_to_output(self, cluster_builder: AbstractClusterBuilder, output: TextIO):
+        output.flush()
+        self._write_columns(self._column_chunks(cluster_builder), output.buffer)
+
+    def _write_stream_to_output(self, clusters: Iterable[Tuple[int, np.ndarray]], entities: Sequence[str],
+                                output: TextIO):
+        output.flush()
+        self._write_columns(((self._lookup(entities, entity_indices),
+                              np.full(len(entity_indices), cluster_id, dtype=np.int32),
+                              None) for cluster_id, entity_indices in clusters), output.buffer)
+
+    @staticmethod
+    def _column_chunks(cluster_builder: AbstractClusterBuilder) -> Iterator[ColumnChunk]:
+        assignment: ClusterAssignment = cluster_builder.clusters()
+
+        for start in range(0, len(assignment.labels), COLUMN_CHUNK_SIZE):
+            end: int = start + COLUMN_CHUNK_SIZE
+            yield (assignment.row_entities(start, end),
+                   assignment.labels[start:end],
+                   assignment.scores[start:end] if assignment.scores is not None else None)
+
+    @staticmethod
+    def _lookup(entities: Sequence[str], entity_indices: np.ndarray) -> Sequence[str]:
+        return [entities[index] for index in entity_indices.tolist()]
+
+    @abstractmethod
+    def _write_columns(self, chunks: Iterable[ColumnChunk], output: BinaryIO) -> None:
+        raise NotImplementedError
@@ -0,0 +1,99 @@
+from abc import abstractmethod
+from collections import deque
+from multiprocessing.pool import Pool, AsyncResult
+from typing import Optional, TextIO, Iterable, Iterator, List, Tuple, Sequence, Deque
+
+import numpy as np
+
+from clustering.abstract_cluster_builder import AbstractClusterBuilder
+from clustering.cluster_index import ClusterIndex
+from util.process_worker import initialize_worker, call_worker
+from writers.abstract_cluster_writer import AbstractClusterWriter
+
+OUTPUT_CHUNK_SIZE = 10000
+PENDING_CHUNKS_PER_PROCESS = 2
+
+
+class AbstractLineClusterWriter(AbstractClusterWriter):
+    """Writes clusters as text lines, formatted in chunks of members by ``--threads`` processes if requested."""
+
+    def _write_to_output(self, cluster_builder: AbstractClusterBuilder, output: TextIO):
+        cluster_index: ClusterIndex = cluster_builder.clusters().entity_index()
+        entities: Sequence[str] = cluster_builder.entities()
+        chunk_bounds: List[Tuple[int, int]] = [(start, start + OUTPUT_CHUNK_SIZE) for start in
+                                               range(0, len(cluster_index.entity_indices), OUTPUT_CHUNK_SIZE)]
+        self._write_header(output)
+
+        if self._parallel_executions < 2 or len(chunk_bounds) < 2:
+            for start, end in chunk_bounds:
+                output.write(self._format_chunk(cluster_index, entities, start, end))
+            return
+
+        # formatting is bound by the interpreter, so chunks are formatted by forked processes sharing the
+        # index and the entities, while this process writes the chunks already formatted in order
+        # only a bounded window of chunks is in flight, so a slow output cannot make formatted chunks pile up
+        with Pool(processes=self._parallel_executions, initializer=initialize_worker,
+                  initargs=(ChunkFormatter(self, cluster_index, entities),)) as pool:
+            pending: Deque[AsyncResult] = deque()
+            for bounds in chunk_bounds:
+                if len(pending) >= PENDING_CHUNKS_PER_PROCESS * self._parallel_executions:
+                    output.write(pending.popleft().get())
+                pending.append(pool.apply_async(call_worker, (bounds,)))
+
+            while pending:
+                output.write(pending.popleft().get())
+
+    def _write_stream_to_output(self, clusters: Iterable[Tuple[int, np.ndarray]], entities: Sequence[str],
+                                output: TextIO):
+        self._write_header(output)
+
+        for cluster_id, entity_indices in clusters:
+            cluster_index: ClusterIndex = ClusterIndex(np.array([cluster_id]), np.array([0, len(entity_indices)]),
+                                                       entity_indices)
+            for start in range(0, len(entity_indices), OUTPUT_CHUNK_SIZE):
+                output.write(self._format_chunk(cluster_index, entities, start, start + OUTPUT_CHUNK_SIZE))
+            # make partial results visible while later clusters are still being searched
+            output.flush()
+
+    def _format_chunk(self, cluster_index: ClusterIndex, entities: Sequence[str], start: int, end: int) -> str:
+        """Format the members at positions ``start`` to ``end`` of ``cluster_index``."""
+        lines: List[str] = []
+        position: int = int(np.searchsorted(cluster_index.offsets, start, side="right")) - 1
+
+        while position < len(cluster_index) and cluster_index.offsets[position] < end:
+            cluster_start, cluster_end = cluster_index.offsets[position:position + 2].tolist()
+            members: Iterator[str] = (entities[index] for index in
+                                      cluster_index.entity_indices[max(start, cluster_start):
+                                                                   min(end, cluster_end)].tolist())
+            lines.extend(self._format_cluster(int(cluster_index.cluster_ids[position]), cluster_end - cluster_start,
+                                              cluster_start >= start, members))
+            position += 1
+
+        return "".join(f"{line}\n" for line in lines)
+
+    def _write_header(self, output: TextIO) -> None:
+        header: Optional[str] = self._header()
+        if header is not None:
+            output.write(f"{header}\n")
+
+    def _header(self) -> Optional[str]:
+        return None
+
+    @abstractmethod
+    def _format_cluster(self, cluster_id: int, size: int, starts_cluster: bool,
+                        entities: Iterator[str]) -> Iterable[str]:
+        """Lines for ``entities`` of a cluster, which may be the first or a later part of its members."""
+        raise NotImplementedError
+
+
+
+class ChunkFormatter:
+    """Picklable ``_format_chunk`` of a writer bound to the index and entities it formats."""
+
+    def __init__(self, writer: AbstractLineClusterWriter, cluster_index: ClusterIndex, entities: Sequence[str]):
+        self._writer: AbstractLineClusterWriter = writer
+        self._cluster_index: ClusterIndex = cluster_index
+        self._entities: Sequence[str] = entities
+
+    def __call__(self, bounds: Tuple[int, int]) -> str:
+        return self._writer._format_chunk(self._cluster_index, self._entities, *bounds)
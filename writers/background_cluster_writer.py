@@ -0,0 +1,59 @@
+from pathlib import Path
+from queue import Queue
+from threading import Thread
+from typing import Optional, Tuple, Iterator
+
+import numpy as np
+
+from clustering.abstract_cluster_builder import AbstractClusterBuilder
+from writers.abstract_cluster_writer import AbstractClusterWriter
+
+
+class BackgroundClusterWriter:
+    """Consumes clusters as ``(cluster id, entity indices)`` and writes them on a separate thread.
+
+    Writing overlaps with the search for further clusters, and the output shows partial results early.
+    """
+
+    def __init__(self, writer: AbstractClusterWriter, cluster_builder: AbstractClusterBuilder,
+                 sink: Optional[Path] = None):
+        self._writer: AbstractClusterWriter = writer
+        self._cluster_builder: AbstractClusterBuilder = cluster_builder
+        self._sink: Optional[Path] = sink
+        self._queue: "Queue[Optional[Tuple[int, np.ndarray]]]" = Queue()
+        self._thread: Optional[Thread] = None
+        self._error: Optional[BaseException] = None
+
+    def __enter__(self) -> "BackgroundClusterWriter":
+        return self
+
+    def __call__(self, cluster_id: int, entity_indices: np.ndarray) -> None:
+        # the builder knows its entities only after loading the model, start writing with the first cluster
+        self._start()
+        self._queue.put((cluster_id, entity_indices))
+
+    def __exit__(self, exception_type, exception, traceback) -> None:
+        self._start()
+        self._queue.put(None)
+        self._thread.join()
+
+        if self._error is not None and exception is None:
+            raise self._error
+
+    def _start(self) -> None:
+        if self._thread is None:
+            self._thread = Thread(target=self._write, name="ClusterWriter", daemon=True)
+            self._thread.start()
+
+    def _write(self) -> None:
+        try:
+            self._writer.write_stream(self._cluster_builder.name(), self._clusters(),
+                                      self._cluster_builder.entities(), self._sink)
+        except BaseException as error:
+            self._error = error
+            # keep draining, so that the producer never blocks on a writer which gave up
+            for _ in self._clusters():
+                pass
+
+    def _clusters(self) -> Iterator[Tuple[int, np.ndarray]]:
+        return iter(self._queue.get, None)
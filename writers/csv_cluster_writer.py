@@ -1,16 +1,16 @@
-from typing import Iterable
+from typing import Iterable, Iterator, Optional
 
-from clustering.abstract_cluster_builder import AbstractClusterBuilder
-from writers.abstract_cluster_writer import AbstractClusterWriter
+from writers.abstract_line_cluster_writer import AbstractLineClusterWriter
 
 
-class CSVClusterWriter(AbstractClusterWriter):
+class CSVClusterWriter(AbstractLineClusterWriter):
 
-    def _generate_output(self, cluster_builder: AbstractClusterBuilder) -> Iterable[str]:
-        yield "cluster_id,entity"
-        for i in cluster_builder.clusters().keys():
-            yield from [f"{i},{value}" for value in cluster_builder.clusters()[i]]
+    def _header(self) -> Optional[str]:
+        return "cluster_id,entity"
+
+    def _format_cluster(self, cluster_id: int, size: int, starts_cluster: bool,
+                        entities: Iterator[str]) -> Iterable[str]:
+        return (f"{cluster_id},{value}" for value in entities)
 
     def _file_extension(self):
         return "csv"
-
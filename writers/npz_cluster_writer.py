@@ -0,0 +1,30 @@
+from typing import BinaryIO, Dict, List, Iterable
+
+import numpy as np
+
+from util.model_io import pack_entities
+from writers.abstract_columnar_cluster_writer import AbstractColumnarClusterWriter, ColumnChunk
+
+
+class NpzClusterWriter(AbstractColumnarClusterWriter):
+    """Stores ``entities``, ``labels`` and optionally ``distances`` as arrays of one .npz file.
+
+    ``entities`` holds utf-8 bytes with one entity per line, ``util.model_io.unpack_entities`` turns them back
+    into a list of strings aligned with ``labels``.
+    """
+
+    def _write_columns(self, chunks: Iterable[ColumnChunk], output: BinaryIO) -> None:
+        columns: Dict[str, List[np.ndarray]] = {"entities": [np.empty(0, dtype=np.uint8)],
+                                                "labels": [np.empty(0, dtype=np.int32)],
+                                                "distances": []}
+
+        for entities, labels, distances in chunks:
+            columns["entities"].append(pack_entities(entities))
+            columns["labels"].append(labels)
+            if distances is not None:
+                columns["distances"].append(distances)
+
+        np.savez(output, **{name: np.concatenate(chunks) for name, chunks in columns.items() if chunks})
+
+    def _file_extension(self):
+        return "npz"
@@ -0,0 +1,40 @@
+from typing import BinaryIO, Optional, Iterable
+
+from writers.abstract_columnar_cluster_writer import AbstractColumnarClusterWriter, ColumnChunk
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+class ParquetClusterWriter(AbstractColumnarClusterWriter):
+
+    def __init__(self, parallel_executions: int = 1):
+        super(ParquetClusterWriter, self).__init__(parallel_executions)
+
+        if pyarrow is None:
+            raise Exception("Parquet output requires pyarrow. Install it with 'pip install pyarrow'")
+
+    def _write_columns(self, chunks: Iterable[ColumnChunk], output: BinaryIO) -> None:
+        writer: Optional[pyarrow.parquet.ParquetWriter] = None
+
+        for entities, labels, distances in chunks:
+            columns = {"entity": pyarrow.array(entities, type=pyarrow.string()),
+                       "cluster_id": pyarrow.array(labels)}
+            if distances is not None:
+                columns["distance"] = pyarrow.array(distances)
+
+            table: pyarrow.Table = pyarrow.Table.from_pydict(columns)
+            if writer is None:
+                writer = pyarrow.parquet.ParquetWriter(output, table.schema)
+            writer.write_table(table)
+
+        if writer is None:
+            writer = pyarrow.parquet.ParquetWriter(output, pyarrow.schema([("entity", pyarrow.string()),
+                                                                           ("cluster_id", pyarrow.int32())]))
+        writer.close()
+
+    def _file_extension(self):
+        return "parquet"
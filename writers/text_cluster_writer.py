@@ -1,17 +1,15 @@
-from typing import Iterable
+from typing import Iterable, Iterator
 
-from clustering.abstract_cluster_builder import AbstractClusterBuilder
-from writers.abstract_cluster_writer import AbstractClusterWriter
+from writers.abstract_line_cluster_writer import AbstractLineClusterWriter
 
 
-class TextClusterWriter(AbstractClusterWriter):
+class TextClusterWriter(AbstractLineClusterWriter):
 
-    def _generate_output(self, cluster_builder: AbstractClusterBuilder) -> Iterable[str]:
-        for i in cluster_builder.clusters().keys():
-            yield f"[[CLUSTER {i}]] with {len(cluster_builder.clusters()[i])} entities"
-            yield from cluster_builder.clusters()[i]
+    def _format_cluster(self, cluster_id: int, size: int, starts_cluster: bool,
+                        entities: Iterator[str]) -> Iterable[str]:
+        if starts_cluster:
+            yield f"[[CLUSTER {cluster_id}]] with {size} entities"
+        yield from entities
 
     def _file_extension(self):
         return "txt"
-
-